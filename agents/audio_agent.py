@@ -1,60 +1,169 @@
 # agents/audio_agent.py
 
 import os
-import whisper
+import re
+import subprocess
+import threading
+import time
+from chunking import chunk_text, count_tokens
+import config
 import logging
 
 # Configure logging
 app_logger = logging.getLogger("DocumentAI")
 app_logger.setLevel(logging.INFO)
 
-# Load the Whisper model
-model = whisper.load_model("base")  # Local model
+SAMPLE_RATE = 16000  # Whisper expects 16 kHz mono
+
+# The Whisper model is loaded on first use (or by warm_up) so importing this module is cheap.
+_model = None
+_model_lock = threading.Lock()
+
+def get_model():
+    """Return the local Whisper model, loading it on first call."""
+    global _model
+    with _model_lock:
+        if _model is None:
+            import torch
+            import whisper
+            # Ingest workers run side by side; split the cores instead of oversubscribing them.
+            torch.set_num_threads(max(1, (os.cpu_count() or 1) // config.INGEST_MAX_WORKERS))
+            _model = whisper.load_model("base")  # Local model
+    return _model
+
+def warm_up():
+    get_model()
+
+def get_duration(file_path):
+    """Duration of an audio file in seconds, via ffprobe."""
+    out = subprocess.run(
+        ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "csv=p=0", file_path],
+        capture_output=True, text=True, check=True
+    ).stdout.strip()
+    return float(out)
+
+def detect_silences(file_path):
+    """Return the midpoints (seconds) of silent stretches found by ffmpeg's silencedetect."""
+    stderr = subprocess.run(
+        ["ffmpeg", "-nostdin", "-i", file_path, "-af",
+         f"silencedetect=noise={config.AUDIO_SILENCE_NOISE_DB}dB:d={config.AUDIO_SILENCE_MIN_SECONDS}",
+         "-f", "null", "-"],
+        capture_output=True, text=True
+    ).stderr
+    starts = [float(x) for x in re.findall(r"silence_start: ([\d.]+)", stderr)]
+    ends = [float(x) for x in re.findall(r"silence_end: ([\d.]+)", stderr)]
+    return [(start + end) / 2 for start, end in zip(starts, ends)]
+
+def choose_cuts(duration, silences, window, tolerance):
+    """
+    Cut points for windows of about `window` seconds, moved to the nearest silence
+    within `tolerance` of each target. Returns [(start, end), ...].
+    """
+    cuts = [0.0]
+    while duration - cuts[-1] > window:
+        target = cuts[-1] + window
+        nearby = [s for s in silences if abs(s - target) <= tolerance and s > cuts[-1]]
+        cuts.append(min(nearby, key=lambda s: abs(s - target)) if nearby else target)
+    # Fold a short tail into the previous window.
+    if len(cuts) > 1 and duration - cuts[-1] < window / 4:
+        cuts.pop()
+    return list(zip(cuts, cuts[1:] + [duration]))
+
+def plan_segments(file_path):
+    """Split an audio file into transcription windows, on silence where possible."""
+    duration = get_duration(file_path)
+    window = config.AUDIO_SEGMENT_SECONDS
+    if duration <= window:
+        return {"duration": duration, "segments": [(0.0, duration)]}
+    silences = detect_silences(file_path) if config.AUDIO_SPLIT_ON_SILENCE else []
+    segments = choose_cuts(duration, silences, window, config.AUDIO_SILENCE_TOLERANCE_SECONDS)
+    app_logger.info("[Audio Agent]: Planned %d segments for %s (%.0fs)", len(segments), file_path, duration)
+    return {"duration": duration, "segments": segments}
+
+def load_audio_window(file_path, start, end):
+    """Decode [start, end) seconds of a file to 16 kHz mono float32, without reading the rest."""
+    import numpy as np
+    out = subprocess.run(
+        ["ffmpeg", "-nostdin", "-threads", "0", "-ss", str(start), "-t", str(end - start), "-i", file_path,
+         "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(SAMPLE_RATE), "-"],
+        capture_output=True, check=True
+    ).stdout
+    return np.frombuffer(out, np.int16).flatten().astype(np.float32) / 32768.0
+
+def transcribe_segment(file_path, start, end):
+    """
+    Transcribe one window and pack Whisper's timed segments into token-budgeted
+    chunks that carry absolute start_time/end_time metadata (seconds).
+    """
+    result = get_model().transcribe(load_audio_window(file_path, start, end), fp16=False)
+    source = os.path.basename(file_path)
+    chunks = []
+    current, current_tokens = [], 0
+
+    def flush():
+        if current:
+            chunks.append({
+                "text": " ".join(seg["text"].strip() for seg in current),
+                "source": source,
+                "type": "AudioText",  # Custom type for audio chunks
+                "start_time": round(start + current[0]["start"], 2),
+                "end_time": round(start + current[-1]["end"], 2),
+            })
+
+    for seg in result.get("segments", []):
+        if not seg["text"].strip():
+            continue
+        tokens = count_tokens(seg["text"])
+        if current and current_tokens + tokens > config.CHUNK_MAX_TOKENS:
+            flush()
+            current, current_tokens = [], 0
+        current.append(seg)
+        current_tokens += tokens
+    flush()
+    if not chunks and result.get("text", "").strip():
+        chunks = chunk_text(result["text"], source=source, chunk_type="AudioText")
+    return chunks
 
 def handle_audio(file_path, session_id):
     """Transcribe audio and return chunks as a list of dictionaries.
 
+    Long files are transcribed window by window in this process; the ingest job
+    runner uses plan_segments/transcribe_segment directly to spread windows over
+    the worker pool instead.
+
     Args:
         file_path (str): Path to the audio file to process.
         session_id (str): Unique identifier for the session.
 
     Returns:
-        tuple: (session_id, formatted_chunks) where formatted_chunks is a list of dictionaries
-               containing 'text', 'source', and 'type' keys.
+        tuple: (formatted_chunks, session_id) where formatted_chunks is a list of dictionaries
+               containing 'text', 'source', 'type', 'start_time' and 'end_time' keys.
     """
     app_logger.info("[Audio Agent]: Processing audio file: %s", file_path)
     
     # Check if the file exists
     if not os.path.exists(file_path):
         app_logger.error("[Audio Agent]: File not found: %s", file_path)
-        return session_id, []
+        return [], session_id
     
     # Transcribe the audio file with error handling
+    started = time.perf_counter()
     try:
-        result = model.transcribe(file_path)
-        text = result["text"]
+        plan = plan_segments(file_path)
+        formatted_chunks = []
+        for start, end in plan["segments"]:
+            formatted_chunks.extend(transcribe_segment(file_path, start, end))
         app_logger.info("[Audio Agent]: Transcription successful for %s", file_path)
     except Exception as e:
         app_logger.error("[Audio Agent]: Transcription failed for %s: %s", file_path, str(e))
-        return session_id, []
+        return [], session_id
     
     # Handle empty transcription
-    if not text.strip():
+    if not formatted_chunks:
         app_logger.warning("[Audio Agent]: No text transcribed from %s", file_path)
-        return session_id, []
-    
-    # Split text into chunks of 500 characters
-    chunks = [text[i:i+500] for i in range(0, len(text), 500)]
-    
-    # Format chunks as a list of dictionaries, matching the expected structure
-    formatted_chunks = [
-        {
-            "text": chunk.strip(),  # Remove leading/trailing whitespace
-            "source": os.path.basename(file_path),  # Use filename as source
-            "type": "AudioText"  # Custom type for audio chunks
-        }
-        for chunk in chunks if chunk.strip()  # Skip empty chunks
-    ]
+        return [], session_id
     
-    app_logger.info("[Audio Agent]: Generated %d chunks for %s", len(formatted_chunks), file_path)
-    return session_id, formatted_chunks
\ No newline at end of file
+    elapsed = time.perf_counter() - started
+    app_logger.info("[Audio Agent]: Generated %d chunks for %s, real-time factor %.2f",
+                    len(formatted_chunks), file_path, elapsed / plan["duration"] if plan["duration"] else 0.0)
+    return formatted_chunks, session_id
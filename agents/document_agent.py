@@ -2,7 +2,9 @@
 
 import os
 import logging
-from unstructured.partition.auto import partition
+from chunking import chunk_elements
+import config
+import telemetry
 
 # Use the custom app logger
 app_logger = logging.getLogger("DocumentAI")
@@ -14,13 +16,8 @@ logging.getLogger("pdfminer").setLevel(logging.ERROR)
 logging.getLogger("pypdf").setLevel(logging.ERROR)
 logging.getLogger("pikepdf").setLevel(logging.ERROR)
 
-def handle_document(file_path, session_id):
-    app_logger.info("Started Document Agent:")
-
-    # Partition the document with unstructured.io; this returns a list of element objects.
-    elements = partition(filename=file_path)
-
-    # Build a list of dictionaries that preserves the text, element type, and all metadata.
+def elements_to_chunks(elements, file_path):
+    """Build one chunk dict per unstructured element, preserving its text, type and metadata."""
     chunks = []
     for el in elements:
         # Ensure the element has text and it is non-empty.
@@ -39,13 +36,96 @@ def handle_document(file_path, session_id):
                 except Exception as e:
                     app_logger.warning("Could not extract metadata for element: %s", e)
             chunks.append(chunk_data)
+    return chunks
+
+def warm_up():
+    # unstructured is imported lazily; importing it takes seconds.
+    import unstructured.partition.auto  # noqa: F401
+
+PDF_STRATEGIES = ("auto", "fast", "hi_res", "ocr_only")
+
+def has_text_layer(file_path, sample_pages=5):
+    """True if the PDF's first pages carry enough extractable text to skip OCR."""
+    from pypdf import PdfReader
+    reader = PdfReader(file_path)
+    pages = reader.pages[:sample_pages]
+    if not pages:
+        return False
+    chars = sum(len((page.extract_text() or "").strip()) for page in pages)
+    return chars / len(pages) >= config.PDF_TEXT_LAYER_MIN_CHARS
+
+def resolve_strategy(file_path, strategy=None):
+    """
+    Map "auto" (the default) to "fast" for born-digital PDFs and to
+    config.PDF_OCR_STRATEGY for scans; explicit strategies pass through.
+    """
+    strategy = strategy or config.PDF_STRATEGY
+    if strategy != "auto":
+        return strategy
+    try:
+        return "fast" if has_text_layer(file_path) else config.PDF_OCR_STRATEGY
+    except Exception as e:
+        app_logger.warning("[Document Agent]: Text layer check failed for %s: %s", file_path, e)
+        return config.PDF_OCR_STRATEGY
+
+def plan_pdf_pages(file_path, strategy=None):
+    """Split a PDF into page ranges of config.PDF_PAGES_PER_SEGMENT, each partitioned with one strategy."""
+    from pypdf import PdfReader
+    page_count = len(PdfReader(file_path).pages)
+    strategy = resolve_strategy(file_path, strategy)
+    step = config.PDF_PAGES_PER_SEGMENT
+    segments = [(start, min(start + step, page_count), strategy) for start in range(0, page_count, step)]
+    app_logger.info("[Document Agent]: %d pages in %d ranges, strategy %s", page_count, len(segments), strategy)
+    return {"pages": page_count, "strategy": strategy, "segments": segments}
+
+def partition_pages(file_path, start, end, strategy):
+    """Partition pages [start, end) of a PDF and return their element dicts, unchunked."""
+    from pypdf import PdfReader, PdfWriter
+    from unstructured.partition.pdf import partition_pdf
+
+    reader = PdfReader(file_path)
+    writer = PdfWriter()
+    for page in reader.pages[start:end]:
+        writer.add_page(page)
+    range_path = f"{file_path}.pages-{start}-{end}.pdf"
+    with open(range_path, "wb") as f:
+        writer.write(f)
+    try:
+        elements = partition_pdf(
+            filename=range_path,
+            strategy=strategy,
+            starting_page_number=start + 1,
+            metadata_filename=os.path.basename(file_path),
+        )
+    finally:
+        os.remove(range_path)
+    return elements_to_chunks(elements, file_path)
+
+def merge_pages(ranges):
+    """Join per-range element dicts in page order and chunk them as one document."""
+    elements = [element for page_range in ranges for element in page_range]
+    return chunk_elements(elements)
+
+def handle_document(file_path, session_id, strategy=None):
+    app_logger.info("Started Document Agent:")
+    from unstructured.partition.auto import partition
+
+    # Partition the document with unstructured.io; this returns a list of element objects.
+    if file_path.lower().endswith(".pdf"):
+        elements = partition(filename=file_path, strategy=resolve_strategy(file_path, strategy))
+    else:
+        elements = partition(filename=file_path)
+
+    # Pack the elements into token-budgeted chunks, keeping titles as section anchors.
+    chunks = chunk_elements(elements_to_chunks(elements, file_path))
     
     # Print a preview of the resulting chunks.
-    if len(chunks) > 2:
-        preview = f"{chunks[:1]}, ..."
-    else:
-        preview = str(chunks[:10])
-    app_logger.info("[Document Agent]: Partitioned Document Agent Elements: %s", preview)
+    if telemetry.log_payloads():
+        if len(chunks) > 2:
+            preview = f"{chunks[:1]}, ..."
+        else:
+            preview = str(chunks[:10])
+        app_logger.info("[Document Agent]: Partitioned Document Agent Elements: %s", preview)
     
     # Send the full chunks with metadata to the vector store.
     return chunks, session_id
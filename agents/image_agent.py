@@ -1,25 +1,70 @@
+import hashlib
 import os
+import time
 import logging
-from unstructured.partition.image import partition_image
+from chunking import chunk_elements
+import config
+import telemetry
+from ocr_cache import get_ocr_cache
 
 app_logger = logging.getLogger("DocumentAI")
 app_logger.setLevel(logging.INFO)
 
-def handle_image(file_path, session_id):
-    app_logger.info("Started Image Agent:")
-    
-    # Partition the image file
-    elements = partition_image(filename=file_path)
-    
-    # Build chunks as a list of dictionaries
-    chunks = []
+# Formats whose frames are pages; other multi-frame images (GIF, APNG) are OCR'd on their first frame.
+MULTI_PAGE_FORMATS = ("TIFF",)
+
+# Keys that describe the upload rather than the pixels; set per file, never cached.
+FILE_KEYS = ("source", "filename", "file_directory", "last_modified", "page_number")
+
+def warm_up():
+    import unstructured.partition.image  # noqa: F401
+
+def normalize_image(image):
+    """
+    Downscale to OCR_TARGET_DPI (or to OCR_MAX_SIDE when the DPI is unknown) and
+    convert to grayscale. Returns a new, fully loaded image.
+    """
+    from PIL import Image
+    scale = 1.0
+    dpi = image.info.get("dpi")
+    if dpi and dpi[0] and dpi[0] > config.OCR_TARGET_DPI:
+        scale = config.OCR_TARGET_DPI / float(dpi[0])
+    scale = min(scale, config.OCR_MAX_SIDE / max(image.size))
+    normalized = image.convert("L" if config.OCR_GRAYSCALE else "RGB")
+    if scale < 1.0:
+        size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+        normalized = normalized.resize(size, Image.LANCZOS)
+    return normalized
+
+def perceptual_hash(image, size=None):
+    """Difference hash: one bit per horizontally adjacent pair on a size x size grid, as hex."""
+    from PIL import Image
+    size = size or config.OCR_HASH_SIZE
+    pixels = list(image.convert("L").resize((size + 1, size), Image.LANCZOS).getdata())
+    bits = 0
+    for row in range(size):
+        for col in range(size):
+            offset = row * (size + 1) + col
+            bits = bits << 1 | (pixels[offset] > pixels[offset + 1])
+    return f"{bits:0{size * size // 4}x}"
+
+def ocr_cache_key(image) -> str:
+    # The normalization settings change what Tesseract sees, so they are part of the key.
+    return (f"{perceptual_hash(image)}:{config.OCR_TARGET_DPI}:{config.OCR_MAX_SIDE}:"
+            f"{int(config.OCR_GRAYSCALE)}")
+
+def fingerprint(image) -> str:
+    """SHA-256 of the exact pixels; a cached OCR result is only reused when this matches."""
+    digest = hashlib.sha256(f"{image.mode}:{image.width}x{image.height}:".encode())
+    digest.update(image.tobytes())
+    return digest.hexdigest()
+
+def elements_to_dicts(elements):
+    """Element dicts with scalar metadata, without the per-file keys."""
+    element_dicts = []
     for el in elements:
         if hasattr(el, "text") and el.text:
-            chunk_data = {
-                "text": el.text,
-                "source": os.path.basename(file_path),
-                "type": el.__class__.__name__
-            }
+            element = {"text": el.text, "type": el.__class__.__name__}
             # Handle metadata safely
             if hasattr(el, "metadata"):
                 try:
@@ -28,10 +73,58 @@ def handle_image(file_path, session_id):
                     for key, value in metadata.items():
                         if not isinstance(value, (str, int, float, bool)):
                             metadata[key] = str(value)
-                    chunk_data.update(metadata)
+                    element.update(metadata)
                 except Exception as e:
                     app_logger.warning("Could not extract metadata for image element: %s", e)
-            chunks.append(chunk_data)
-    
-    app_logger.info("[Image Agent]: Partitioned Image Elements: %s", chunks[:1])
-    return chunks, session_id
\ No newline at end of file
+            element_dicts.append({key: value for key, value in element.items() if key not in FILE_KEYS})
+    return element_dicts
+
+def plan_frames(file_path):
+    """One OCR task per page of a multi-page TIFF, or a single task for any other image."""
+    from PIL import Image
+    with Image.open(file_path) as image:
+        pages = image.n_frames if image.format in MULTI_PAGE_FORMATS else 1
+    app_logger.info("[Image Agent]: %d pages in %s", pages, file_path)
+    return {"pages": pages, "segments": [(frame,) for frame in range(pages)]}
+
+def ocr_frame(file_path, frame):
+    """
+    OCR one page of an image and return its element dicts, unchunked. The page is
+    normalized first, and OCR is skipped when the OCR cache holds the same pixels.
+    """
+    from PIL import Image
+    with Image.open(file_path) as image:
+        image.seek(frame)
+        normalized = normalize_image(image)
+    key, pixels = ocr_cache_key(normalized), fingerprint(normalized)
+    cache = get_ocr_cache()
+    element_dicts = cache.get(key, pixels)
+    if element_dicts is None:
+        from unstructured.partition.image import partition_image
+        frame_path = f"{file_path}.frame-{frame}.png"
+        normalized.save(frame_path)
+        started = time.perf_counter()
+        try:
+            elements = partition_image(filename=frame_path)
+        finally:
+            os.remove(frame_path)
+        element_dicts = elements_to_dicts(elements)
+        cache.put(key, pixels, element_dicts, time.perf_counter() - started)
+    source = os.path.basename(file_path)
+    return [{**element, "source": source, "filename": source, "page_number": frame + 1}
+            for element in element_dicts]
+
+def merge_frames(pages):
+    """Join per-page element dicts in page order and chunk them as one document."""
+    return chunk_elements([element for page in pages for element in page])
+
+def handle_image(file_path, session_id):
+    app_logger.info("Started Image Agent:")
+
+    # OCR every page in turn; the ingest jobs run pages in parallel via plan_frames/ocr_frame instead
+    plan = plan_frames(file_path)
+    chunks = merge_frames([ocr_frame(file_path, *args) for args in plan["segments"]])
+
+    if telemetry.log_payloads():
+        app_logger.info("[Image Agent]: Partitioned Image Elements: %s", chunks[:1])
+    return chunks, session_id
@@ -0,0 +1,21 @@
+# agents/warmup.py
+import os
+import logging
+
+import config
+from agents import audio_agent, document_agent, image_agent
+
+app_logger = logging.getLogger("DocumentAI")
+app_logger.setLevel(logging.INFO)
+
+def warm_up_worker():
+    """Import unstructured and load Whisper in an ingest worker process before the first job."""
+    document_agent.warm_up()
+    image_agent.warm_up()
+    audio_agent.warm_up()
+    return os.getpid()
+
+def apply_config(settings):
+    """Pool initializer: adopt the parent's config values, including ones changed after import."""
+    for name, value in settings.items():
+        setattr(config, name, value)
@@ -0,0 +1,135 @@
+# answer_cache.py
+import math
+import string
+import threading
+import time
+import logging
+from collections import OrderedDict
+
+import config
+
+app_logger = logging.getLogger("DocumentAI")
+app_logger.setLevel(logging.INFO)
+
+
+def question_anchors(question: str) -> frozenset:
+    """Numbers and capitalized words past the first, which a reworded question must keep."""
+    words = [word.strip(string.punctuation) for word in question.split()]
+    return frozenset(word.lower() for i, word in enumerate(words)
+                     if word and (any(c.isdigit() for c in word) or (i and word[0].isupper())))
+
+
+def _cosine(a, b) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+class AnswerCache:
+    """
+    Per-session cache of /ask answers with TTL and LRU eviction.
+
+    Entries are keyed on the stop-word-filtered question. With an embedding, a
+    lookup can also match a reworded question of the same session by cosine
+    similarity, provided both name the same numbers and proper nouns ("revenue in
+    2020" never matches "revenue in 2021"). An empty key, from a question made only
+    of stop words ("Why is that?"), is never cached: unrelated questions share it.
+    Each entry records the session version (kept in the shared session
+    store and bumped whenever the session's chunks change, on any worker) that its
+    answer was computed against; a lookup with a newer version drops it.
+    """
+
+    def __init__(self, max_entries: int, ttl: float, threshold: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.threshold = threshold
+        self._entries = OrderedDict()  # (session_id, key) -> (answer, embedding, stored_at, version, anchors)
+        self._by_session = {}  # session_id -> set of keys
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+    def _drop(self, session_id: str, key: str):
+        self._entries.pop((session_id, key), None)
+        keys = self._by_session.get(session_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_session[session_id]
+
+    def _fresh(self, session_id: str, key: str, version: int):
+        entry = self._entries.get((session_id, key))
+        if entry is None:
+            return None
+        if time.time() - entry[2] > self.ttl or entry[3] != version:
+            self._drop(session_id, key)
+            return None
+        self._entries.move_to_end((session_id, key))
+        return entry
+
+    def get(self, session_id: str, key: str, embedding=None, version: int = 0, anchors=frozenset()):
+        """
+        Return the cached answer for the question key (or a similar question with the
+        same anchors, see question_anchors) at version, else None.
+        """
+        if not key:
+            return None
+        with self._lock:
+            entry = self._fresh(session_id, key, version)
+            if entry is not None:
+                self.hits += 1
+                return entry[0]
+            if embedding is not None:
+                best_key, best_score = None, self.threshold
+                for other in list(self._by_session.get(session_id, ())):
+                    candidate = self._fresh(session_id, other, version)
+                    if candidate is None or candidate[1] is None or candidate[4] != anchors:
+                        continue
+                    score = _cosine(embedding, candidate[1])
+                    if score >= best_score:
+                        best_key, best_score = other, score
+                if best_key is not None:
+                    self.hits += 1
+                    self.semantic_hits += 1
+                    return self._entries[(session_id, best_key)][0]
+            self.misses += 1
+            return None
+
+    def put(self, session_id: str, key: str, answer: str, embedding=None, version: int = 0,
+            anchors=frozenset()):
+        """Store an answer computed against the session's chunks at version."""
+        if not key:
+            return
+        with self._lock:
+            self._entries[(session_id, key)] = (answer, embedding, time.time(), version, anchors)
+            self._entries.move_to_end((session_id, key))
+            self._by_session.setdefault(session_id, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                (old_session, old_key), _ = next(iter(self._entries.items()))
+                self._drop(old_session, old_key)
+
+    def forget_session(self, session_id: str):
+        """Drop everything held for a session, e.g. after its chunks changed or it was deleted."""
+        with self._lock:
+            for key in list(self._by_session.get(session_id, ())):
+                self._drop(session_id, key)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+answer_cache = AnswerCache(
+    config.ANSWER_CACHE_MAX_ENTRIES,
+    ttl=config.ANSWER_CACHE_TTL_SECONDS,
+    threshold=config.ANSWER_CACHE_SIMILARITY_THRESHOLD,
+)
@@ -0,0 +1,60 @@
+# benchmarks/bench_chunking.py
+"""
+Compare one-vector-per-element ingestion with the packed chunking stage.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_chunking path/to/file.pdf [more files ...]
+
+For each document this reports vectors produced and ingest time (partition +
+chunking + embedding) before and after chunking. Nothing is written to the
+vector store.
+"""
+import os
+import sys
+import time
+
+from unstructured.partition.auto import partition
+
+from agents.document_agent import elements_to_chunks
+from chunking import chunk_elements
+from embedding import embedding_service
+
+
+def bench_file(file_path: str) -> dict:
+    started = time.perf_counter()
+    elements = elements_to_chunks(partition(filename=file_path), file_path)
+    partition_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    embedding_service.embed([e["text"] for e in elements])
+    before_s = partition_s + time.perf_counter() - started
+
+    started = time.perf_counter()
+    chunks = chunk_elements(elements)
+    embedding_service.embed([c["text"] for c in chunks])
+    after_s = partition_s + time.perf_counter() - started
+
+    return {
+        "file": os.path.basename(file_path),
+        "vectors_before": len(elements),
+        "vectors_after": len(chunks),
+        "ingest_s_before": before_s,
+        "ingest_s_after": after_s,
+    }
+
+
+def main(paths: list):
+    if not paths:
+        print(__doc__)
+        return 1
+    embedding_service.embed(["warm-up"])
+    print(f"{'file':40} {'vectors':>17} {'ingest s':>17}")
+    for path in paths:
+        r = bench_file(path)
+        print(f"{r['file'][:40]:40} {r['vectors_before']:>7} -> {r['vectors_after']:<7} "
+              f"{r['ingest_s_before']:>7.2f} -> {r['ingest_s_after']:<7.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
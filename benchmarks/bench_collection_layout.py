@@ -0,0 +1,97 @@
+# benchmarks/bench_collection_layout.py
+"""
+Query latency against total corpus size for the "global", "bucket" and "session" vector store layouts.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_collection_layout [--sizes 1000 10000 50000] [--session-chunks 200] [--buckets 64]
+
+Builds a throwaway Chroma store in a temp directory with random 384-d vectors.
+The corpus is split into sessions of --session-chunks vectors. Every session is
+written to the single global collection and to its hashed bucket collection
+(vector_store.collection_name with --buckets buckets). The first session also
+gets a collection of its own. For each size it times filtered queries against the
+global collection and against the session's bucket, and unfiltered queries
+against the session's own collection. The application's chroma_store is not touched.
+"""
+import argparse
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+import chromadb
+import numpy as np
+
+import config
+from vector_store import collection_name
+
+DIM = 384
+
+
+def build(client, total: int, session_chunks: int, rng):
+    """Returns the collections queried for session s000000: {layout: collection}."""
+    global_collection = client.create_collection("document_chunks", metadata={"hnsw:space": "cosine"})
+    n_sessions = max(total // session_chunks, 1)
+    for s in range(n_sessions):
+        session_id = f"s{s:06d}"
+        vectors = rng.standard_normal((session_chunks, DIM)).astype(np.float32)
+        ids = [f"{session_id}_{i}" for i in range(session_chunks)]
+        metadatas = [{"session_id": session_id, "position": i} for i in range(session_chunks)]
+        global_collection.add(ids=ids, embeddings=vectors, metadatas=metadatas)
+        bucket = client.get_or_create_collection(collection_name(session_id, "bucket"),
+                                                 metadata={"hnsw:space": "cosine"})
+        bucket.add(ids=ids, embeddings=vectors, metadatas=metadatas)
+        if s == 0:
+            own = client.create_collection(f"session_{session_id}", metadata={"hnsw:space": "cosine"})
+            own.add(ids=ids, embeddings=vectors, metadatas=metadatas)
+    return {
+        "global": global_collection,
+        "bucket": client.get_collection(collection_name("s000000", "bucket")),
+        "session": client.get_collection("session_s000000"),
+    }
+
+
+def time_queries(fn, queries) -> list:
+    latencies = []
+    for q in queries:
+        started = time.perf_counter()
+        fn(q)
+        latencies.append((time.perf_counter() - started) * 1000)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--session-chunks", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=15)
+    parser.add_argument("--buckets", type=int, default=config.VECTOR_STORE_BUCKETS)
+    args = parser.parse_args()
+    config.VECTOR_STORE_BUCKETS = args.buckets
+
+    rng = np.random.default_rng(0)
+    layouts = ("global", "bucket", "session")
+    print(f"{'corpus':>8}" + "".join(f"{f'{layout} p50 ms':>16}{f'{layout} p95 ms':>16}" for layout in layouts))
+    for size in args.sizes:
+        path = tempfile.mkdtemp(prefix="bench_layout_")
+        try:
+            client = chromadb.PersistentClient(path=path)
+            collections = build(client, size, args.session_chunks, rng)
+            queries = rng.standard_normal((args.queries, DIM)).astype(np.float32)
+            row = f"{size:>8}"
+            for layout in layouts:
+                # Only the session layout can skip the metadata filter.
+                where = None if layout == "session" else {"session_id": "s000000"}
+                latencies = time_queries(lambda q: collections[layout].query(
+                    query_embeddings=[q], n_results=args.k, where=where), queries)
+                row += f"{statistics.median(latencies):>16.2f}{statistics.quantiles(latencies, n=20)[18]:>16.2f}"
+            print(row)
+        finally:
+            shutil.rmtree(path, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
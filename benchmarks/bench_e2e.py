@@ -0,0 +1,345 @@
+# benchmarks/bench_e2e.py
+"""
+Offline end-to-end benchmark: concurrent /upload and /ask load against the real
+app, with a stub Ollama server in place of llama3.2.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_e2e [--uploads 8] [--asks 200] [--concurrency 8]
+                                   [--kinds pdf,docx,image,audio] [--ask-endpoint both]
+                                   [--llm-latency-ms 300] [--tokens-per-second 40] [--answer-tokens 64]
+                                   [--output result.json] [--compare baseline.json]
+
+Steps:
+1. Generate the fixtures (benchmarks.fixtures) in a temp directory and start the
+   stub Ollama server (benchmarks.stub_ollama).
+2. Start the app in a subprocess (benchmarks.e2e_server) with its stores in the
+   same temp directory, and wait for GET /ready.
+3. Upload the fixtures concurrently, each generated with its own seed so no
+   upload is served from the ingest or OCR cache. Each upload is followed to the
+   end of its ingest job.
+4. Send /ask and/or /ask/stream requests concurrently across the indexed sessions.
+   Sessions that indexed no chunks (the audio fixture has no speech) are left out,
+   since /ask answers them without reaching the LLM.
+
+The report covers throughput plus p50/p95/p99 latency per endpoint. Client-side
+timings are exact. Per-stage timings come from the difference between two GET
+/metrics scrapes and are interpolated within the histogram buckets.
+--output writes the result as JSON; --compare prints the change against an
+earlier result, e.g. one saved on the previous commit. The embedding model and
+the unstructured/Whisper models must be available locally; only the LLM is stubbed.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from benchmarks import fixtures
+from benchmarks.stub_ollama import StubOllama
+
+BUCKET_RE = re.compile(r'^documentai_stage_seconds_bucket\{operation="([^"]*)",stage="([^"]*)",le="([^"]*)"\} (\S+)$')
+CONTENT_TYPES = {"pdf": "application/pdf", "image": "image/png", "audio": "audio/wav",
+                 "docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document"}
+
+
+def summarize(values_ms: list) -> dict:
+    """Exact nearest-rank percentiles of client-side latencies in milliseconds."""
+    if not values_ms:
+        return {"count": 0}
+    ordered = sorted(values_ms)
+
+    def rank(q):
+        return ordered[max(0, math.ceil(q * len(ordered)) - 1)]
+    return {"count": len(ordered), "mean": sum(ordered) / len(ordered),
+            "p50": rank(0.50), "p95": rank(0.95), "p99": rank(0.99), "max": ordered[-1]}
+
+
+def parse_stage_buckets(text: str) -> dict:
+    """(operation, stage) -> [(upper bound, cumulative count), ...] from a /metrics scrape."""
+    buckets = {}
+    for line in text.splitlines():
+        match = BUCKET_RE.match(line)
+        if match:
+            operation, stage, le, count = match.groups()
+            buckets.setdefault((operation, stage), []).append((float(le), float(count)))
+    return buckets
+
+
+def bucket_quantile(buckets: list, q: float):
+    """Estimate a quantile in seconds by linear interpolation inside the bucket that holds it."""
+    total = buckets[-1][1]
+    if not total:
+        return None
+    target = q * total
+    lower_bound, lower_count = 0.0, 0.0
+    for bound, count in buckets:
+        if count >= target:
+            if bound == float("inf"):
+                return lower_bound
+            if count == lower_count:
+                return bound
+            return lower_bound + (bound - lower_bound) * (target - lower_count) / (count - lower_count)
+        lower_bound, lower_count = bound, count
+    return lower_bound
+
+
+def stage_summary(before: str, after: str) -> dict:
+    """
+    Per-stage count and interpolated p50/p95/p99 (ms) for what happened between two
+    scrapes. Values past the largest bucket are reported as that bucket's bound.
+    """
+    start = parse_stage_buckets(before)
+    summary = {}
+    for key, buckets in sorted(parse_stage_buckets(after).items()):
+        previous = dict(start.get(key, []))
+        delta = [(bound, count - previous.get(bound, 0.0)) for bound, count in buckets]
+        if not delta[-1][1]:
+            continue
+        summary["/".join(key)] = {"count": int(delta[-1][1]),
+                                  **{f"p{int(q * 100)}": bucket_quantile(delta, q) * 1000
+                                     for q in (0.50, 0.95, 0.99)}}
+    return summary
+
+
+def start_server(args, ollama_url: str, data_dir: str):
+    log = open(os.path.join(data_dir, "server.log"), "w")
+    command = [sys.executable, "-m", "benchmarks.e2e_server", "--data-dir", data_dir,
+               "--ollama-url", ollama_url, "--port", str(args.port)]
+    if args.answer_cache:
+        command.append("--answer-cache")
+    return subprocess.Popen(command, stdout=log, stderr=subprocess.STDOUT)
+
+
+async def wait_ready(client: httpx.AsyncClient, server, timeout: float) -> float:
+    started = time.perf_counter()
+    while time.perf_counter() - started < timeout:
+        if server.poll() is not None:
+            raise RuntimeError(f"server exited with code {server.returncode}")
+        try:
+            if (await client.get("/ready")).status_code == 200:
+                return time.perf_counter() - started
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.25)
+    raise RuntimeError(f"server not ready after {timeout:.0f}s")
+
+
+async def upload_and_index(client, path: str, kind: str, timings: dict, poll_interval: float):
+    """
+    Upload one file and poll its job; returns the session_id once indexed with at
+    least one chunk, else None.
+    """
+    started = time.perf_counter()
+    with open(path, "rb") as f:
+        response = await client.post("/upload", files={"file": (os.path.basename(path), f, CONTENT_TYPES[kind])})
+    timings["upload"].append((time.perf_counter() - started) * 1000)
+    if response.status_code != 200:
+        timings["errors"].append(f"upload {kind}: HTTP {response.status_code}")
+        return None
+    body = response.json()
+    while True:
+        job = (await client.get(f"/jobs/{body['job_id']}")).json()
+        if job["status"] in ("done", "failed"):
+            break
+        await asyncio.sleep(poll_interval)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    timings["ingest"].append(elapsed_ms)
+    timings[f"ingest_{kind}"].append(elapsed_ms)
+    if job["status"] == "failed":
+        timings["errors"].append(f"ingest {kind}: {job['error']}")
+        return None
+    if not job["chunks"]:
+        timings["empty"].append(kind)
+        return None
+    return body["session_id"]
+
+
+async def ask(client, endpoint: str, session_id: str, question: str, timings: dict):
+    payload = {"session_id": session_id, "question": question}
+    started = time.perf_counter()
+    if endpoint == "ask":
+        response = await client.post("/ask", json=payload)
+        ok = response.status_code == 200
+    else:
+        ok = False
+        async with client.stream("POST", "/ask/stream", json=payload) as response:
+            first_token = None
+            async for line in response.aiter_lines():
+                if first_token is None and line.startswith("data:") and '"token"' in line:
+                    first_token = time.perf_counter()
+                    timings["ask_stream_ttft"].append((first_token - started) * 1000)
+                if line.startswith("event: done"):
+                    ok = True
+            ok = ok and response.status_code == 200
+    timings[endpoint].append((time.perf_counter() - started) * 1000)
+    if not ok:
+        timings["errors"].append(f"{endpoint}: HTTP {response.status_code}")
+
+
+async def run_concurrently(jobs: list, concurrency: int) -> list:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def limited(job):
+        async with semaphore:
+            return await job
+    return await asyncio.gather(*(limited(job) for job in jobs))
+
+
+async def run(args, data_dir: str) -> dict:
+    kinds = args.kinds.split(",")
+    files = fixtures.generate_uploads(os.path.join(data_dir, "fixtures"), kinds, args.uploads,
+                                      args.pdf_pages, args.audio_seconds)
+    stub = StubOllama(latency_ms=args.llm_latency_ms, tokens_per_second=args.tokens_per_second,
+                      tokens=args.answer_tokens)
+    ollama_url = stub.start()
+    server = start_server(args, ollama_url, data_dir)
+    timings = {name: [] for name in ("upload", "ingest", "ask", "ask_stream", "ask_stream_ttft", "errors", "empty")}
+    for kind in kinds:
+        timings[f"ingest_{kind}"] = []
+    limits = httpx.Limits(max_connections=args.concurrency * 2, max_keepalive_connections=args.concurrency * 2)
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", limits=limits,
+                                     timeout=args.request_timeout) as client:
+            ready_seconds = await wait_ready(client, server, args.ready_timeout)
+            print(f"Server ready in {ready_seconds:.1f}s")
+            metrics_before = (await client.get("/metrics")).text
+
+            upload_started = time.perf_counter()
+            uploads = [upload_and_index(client, path, kind, timings, args.poll_interval) for kind, path in files]
+            sessions = [s for s in await run_concurrently(uploads, args.concurrency) if s]
+            upload_seconds = time.perf_counter() - upload_started
+            print(f"Indexed {len(sessions)}/{args.uploads} uploads in {upload_seconds:.1f}s "
+                  f"({len(timings['empty'])} without chunks, left out of the asks)")
+            if not sessions:
+                raise RuntimeError("no upload was indexed with chunks; see server.log")
+
+            endpoints = ["ask", "ask_stream"] if args.ask_endpoint == "both" else [args.ask_endpoint]
+            ask_started = time.perf_counter()
+            asks = [ask(client, endpoints[i % len(endpoints)], sessions[i % len(sessions)],
+                        fixtures.QUESTIONS[i % len(fixtures.QUESTIONS)], timings) for i in range(args.asks)]
+            await run_concurrently(asks, args.concurrency)
+            ask_seconds = time.perf_counter() - ask_started
+            metrics_after = (await client.get("/metrics")).text
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            server.kill()
+        stub.stop()
+
+    return {
+        "commit": _git_commit(),
+        "settings": {key: value for key, value in vars(args).items() if key not in ("output", "compare", "keep")},
+        "ready_seconds": ready_seconds,
+        "empty_uploads": timings["empty"],
+        "throughput": {"uploads_per_second": (len(sessions) + len(timings["empty"])) / upload_seconds
+                       if upload_seconds else 0.0,
+                       "asks_per_second": args.asks / ask_seconds if ask_seconds else 0.0},
+        "endpoints": {name: summarize(values) for name, values in timings.items()
+                      if name not in ("errors", "empty") and values},
+        "stages": stage_summary(metrics_before, metrics_after),
+        "llm_stub": {"requests": stub.requests, "max_in_flight": stub.max_in_flight},
+        "errors": timings["errors"],
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return None
+
+
+def _row(name: str, stats: dict) -> str:
+    cells = "".join(f"{stats[p]:>10.1f}" if stats.get(p) is not None else f"{'-':>10}" for p in ("p50", "p95", "p99"))
+    return f"{name:32} {stats['count']:>7}{cells}"
+
+
+def print_report(result: dict):
+    print(f"\ncommit {result['commit']}  ready in {result['ready_seconds']:.1f}s  "
+          f"{result['throughput']['uploads_per_second']:.2f} uploads/s  "
+          f"{result['throughput']['asks_per_second']:.2f} asks/s  "
+          f"LLM stub max in flight {result['llm_stub']['max_in_flight']}")
+    header = f"{'':32} {'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+    print(f"\n{'endpoint':32}{header[32:]}")
+    for name, stats in result["endpoints"].items():
+        print(_row(name, stats))
+    print(f"\n{'stage (bucket-interpolated)':32}{header[32:]}")
+    for name, stats in result["stages"].items():
+        print(_row(name, stats))
+    if result["errors"]:
+        print(f"\n{len(result['errors'])} errors, first: {result['errors'][0]}")
+
+
+def print_comparison(result: dict, baseline: dict):
+    print(f"\nchange against {baseline.get('commit')} (p50 / p95, negative is faster)")
+    for section in ("endpoints", "stages"):
+        for name, stats in result[section].items():
+            old = baseline.get(section, {}).get(name)
+            if not old or not old.get("count"):
+                continue
+            changes = []
+            for p in ("p50", "p95"):
+                if old.get(p) and stats.get(p) is not None:
+                    changes.append(f"{p} {old[p]:.1f} -> {stats[p]:.1f} ms ({(stats[p] - old[p]) / old[p] * 100:+.0f}%)")
+            if changes:
+                print(f"{name:32} {'   '.join(changes)}")
+    for key, value in result["throughput"].items():
+        old = baseline.get("throughput", {}).get(key)
+        if old:
+            print(f"{key:32} {old:.2f} -> {value:.2f} ({(value - old) / old * 100:+.0f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uploads", type=int, default=8)
+    parser.add_argument("--asks", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--kinds", default="pdf,docx,image,audio", help="fixture kinds uploaded in turn")
+    parser.add_argument("--ask-endpoint", choices=["ask", "ask_stream", "both"], default="both")
+    parser.add_argument("--answer-cache", action="store_true", help="leave the answer cache on")
+    parser.add_argument("--llm-latency-ms", type=float, default=300)
+    parser.add_argument("--tokens-per-second", type=float, default=40)
+    parser.add_argument("--answer-tokens", type=int, default=64)
+    parser.add_argument("--pdf-pages", type=int, default=24)
+    parser.add_argument("--audio-seconds", type=int, default=60)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--poll-interval", type=float, default=0.1)
+    parser.add_argument("--ready-timeout", type=float, default=900)
+    parser.add_argument("--request-timeout", type=float, default=600)
+    parser.add_argument("--output", help="write the result as JSON")
+    parser.add_argument("--compare", help="JSON result of an earlier run to compare against")
+    parser.add_argument("--keep", action="store_true", help="keep the temp directory (stores, fixtures, server.log)")
+    args = parser.parse_args()
+
+    data_dir = tempfile.mkdtemp(prefix="bench_e2e_")
+    try:
+        result = asyncio.run(run(args, data_dir))
+    except RuntimeError as e:
+        # The temp directory is kept so the server log can be read.
+        print(f"Benchmark failed: {e} (server log: {os.path.join(data_dir, 'server.log')})")
+        return 1
+    if not args.keep:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+    print_report(result)
+    if args.compare:
+        with open(args.compare) as f:
+            print_comparison(result, json.load(f))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
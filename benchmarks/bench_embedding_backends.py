@@ -0,0 +1,97 @@
+# benchmarks/bench_embedding_backends.py
+"""
+Retrieval parity and throughput of the "torch" and "onnx" embedding backends.
+
+Usage (from the repository root, after python export_onnx_embedder.py):
+    python -m benchmarks.bench_embedding_backends [--k 1 5 10] [--min-recall 0.95] [--batch-sizes 1 16 64]
+
+Parity: the fixture corpus (benchmarks.fixtures sections over several seeds, one
+sentence per document) is embedded by both backends. Every query ranks the corpus
+by cosine similarity. recall@k is the overlap of the ONNX top k with the PyTorch
+top k, averaged over the fixture questions and one keyword query per topic and
+noun. The cosine between the two backends' vectors of the same sentence is also
+reported. The run exits with status 1 if recall@max(k) falls below --min-recall.
+
+Throughput: texts per second for each backend at each batch size over the
+same corpus, after a warm-up pass.
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from benchmarks import fixtures
+from embedding import load_embedder
+
+
+def corpus(seeds: int) -> list:
+    sentences = []
+    for seed in range(7, 7 + seeds):
+        for _, body in fixtures.sections(seed):
+            for paragraph in body:
+                sentences += [s.strip() + "." for s in paragraph.split(".") if s.strip()]
+    # Duplicates would tie and make the top-k order arbitrary.
+    return list(dict.fromkeys(sentences))
+
+
+def queries() -> list:
+    return fixtures.QUESTIONS + [f"{topic} {noun}" for topic in fixtures.TOPICS for noun in fixtures.NOUNS]
+
+
+def top_k(query_vectors, doc_vectors, k: int):
+    scores = query_vectors @ doc_vectors.T
+    return np.argsort(-scores, axis=1)[:, :k]
+
+
+def recall_at_k(reference, candidate, k: int) -> float:
+    expected, found = top_k(*reference, k), top_k(*candidate, k)
+    return float(np.mean([len(set(e) & set(f)) / k for e, f in zip(expected, found)]))
+
+
+def throughput(model, texts: list, batch_size: int) -> float:
+    model.encode(texts[:batch_size], batch_size=batch_size)
+    started = time.perf_counter()
+    model.encode(texts, batch_size=batch_size)
+    return len(texts) / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 5, 10])
+    parser.add_argument("--min-recall", type=float, default=0.95)
+    parser.add_argument("--seeds", type=int, default=4, help="fixture seeds in the corpus (180 sentences each)")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 16, 64])
+    args = parser.parse_args()
+
+    documents, questions = corpus(args.seeds), queries()
+    print(f"Corpus: {len(documents)} sentences, {len(questions)} queries")
+    models = {backend: load_embedder(backend) for backend in ("torch", "onnx")}
+    vectors = {}
+    for backend, model in models.items():
+        vectors[backend] = (np.asarray(model.encode(questions, batch_size=64), dtype=np.float32),
+                            np.asarray(model.encode(documents, batch_size=64), dtype=np.float32))
+
+    print("\nParity (onnx against torch)")
+    same_text = np.sum(vectors["torch"][1] * vectors["onnx"][1], axis=1)
+    print(f"  cosine of the same sentence: mean {same_text.mean():.4f}, min {same_text.min():.4f}")
+    recalls = {k: recall_at_k(vectors["torch"], vectors["onnx"], k) for k in args.k}
+    for k, recall in recalls.items():
+        print(f"  recall@{k}: {recall:.3f}")
+
+    print(f"\nThroughput (texts/s over {len(documents)} sentences)")
+    print(f"  {'batch size':>10}" + "".join(f"{backend:>12}" for backend in models) + f"{'speed-up':>12}")
+    for batch_size in args.batch_sizes:
+        rates = {backend: throughput(model, documents, batch_size) for backend, model in models.items()}
+        print(f"  {batch_size:>10}" + "".join(f"{rate:>12.0f}" for rate in rates.values())
+              + f"{rates['onnx'] / rates['torch']:>11.2f}x")
+
+    worst = recalls[max(args.k)]
+    if worst < args.min_recall:
+        print(f"\nrecall@{max(args.k)} {worst:.3f} is below --min-recall {args.min_recall}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
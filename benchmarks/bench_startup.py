@@ -0,0 +1,56 @@
+# benchmarks/bench_startup.py
+"""
+Start-up time report for the API module.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_startup [--module main] [--top 15]
+
+Imports the module in a fresh interpreter with `-X importtime` and prints the
+wall time, plus the slowest top-level imports by cumulative time. Compare the
+output across commits to catch packages that creep back into the import path.
+Model loading is not included: since models load lazily, it happens in the
+background warm-up reported by GET /ready.
+"""
+import argparse
+import subprocess
+import sys
+import time
+
+
+def parse_importtime(stderr: str) -> list:
+    """Return (package, cumulative_us) for the top-level imports in -X importtime output."""
+    top_level = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Nested imports are indented by two spaces per level.
+        if name.startswith(" ") and not name.startswith("  "):
+            top_level.append((name.strip(), int(cumulative)))
+    return top_level
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {args.module}"],
+                            capture_output=True, text=True)
+    wall_s = time.perf_counter() - started
+    if result.returncode != 0:
+        print(result.stderr.splitlines()[-1] if result.stderr else "import failed")
+        return result.returncode
+
+    imports = sorted(parse_importtime(result.stderr), key=lambda item: item[1], reverse=True)
+    print(f"import {args.module}: {wall_s:.2f}s wall (interpreter start included)")
+    print(f"{'package':40} {'cumulative ms':>14}")
+    for name, cumulative_us in imports[:args.top]:
+        print(f"{name[:40]:40} {cumulative_us / 1000:>14.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
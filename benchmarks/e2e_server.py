@@ -0,0 +1,44 @@
+# benchmarks/e2e_server.py
+"""
+Run the API against throwaway storage and a given Ollama URL, for bench_e2e.
+
+Usage (from the repository root; normally started by bench_e2e):
+    python -m benchmarks.e2e_server --data-dir DIR --ollama-url URL [--port 8765] [--answer-cache]
+
+config.py values are overridden before the app is imported. The vector store,
+lexical index, session database, OCR cache and uploads all live under --data-dir, so the
+application's own stores are not touched. Without --answer-cache, cached answers
+expire immediately, so every /ask goes through retrieval and the LLM.
+"""
+import argparse
+import os
+import sys
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data-dir", required=True)
+    parser.add_argument("--ollama-url", required=True)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--answer-cache", action="store_true")
+    args = parser.parse_args()
+
+    import config
+    config.OLLAMA_BASE_URL = args.ollama_url
+    config.VECTOR_STORE_PATH = os.path.join(args.data_dir, "chroma_store")
+    config.LEXICAL_INDEX_PATH = os.path.join(args.data_dir, "lexical_store")
+    config.SESSION_DB_PATH = os.path.join(args.data_dir, "sessions.db")
+    config.OCR_CACHE_PATH = os.path.join(args.data_dir, "ocr_cache.db")
+    config.TEMP_DIR = os.path.join(args.data_dir, "temp")
+    if not args.answer_cache:
+        config.ANSWER_CACHE_TTL_SECONDS = 0
+
+    import uvicorn
+    from main import app
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,212 @@
+# benchmarks/fixtures.py
+"""
+Deterministic fixture files for the end-to-end benchmark: a multi-page text PDF,
+a DOCX, a scanned-looking PNG and a WAV file.
+
+Usage (from the repository root):
+    python -m benchmarks.fixtures OUTPUT_DIR [--pdf-pages 24] [--audio-seconds 60]
+
+The files are generated, not stored in the repository. With the same seed every
+run produces the same bytes, so results stay comparable across commits, and
+generate_uploads gives every upload its own seed so no two uploads share bytes.
+The documents share a set of sections on invented topics, and QUESTIONS asks
+about them. The audio is tone bursts separated by silences. It exercises silence
+detection, segmentation and Whisper timing, but yields little or no transcript.
+"""
+import argparse
+import math
+import os
+import random
+import struct
+import sys
+import wave
+
+TOPICS = ["Revenue", "Warranty", "Onboarding", "Security", "Logistics", "Maintenance",
+          "Procurement", "Compliance", "Forecasting", "Support", "Licensing", "Training"]
+NOUNS = ["policy", "schedule", "budget", "contract", "inventory", "audit", "vendor", "region",
+         "quarter", "team", "process", "report", "customer", "invoice", "shipment", "release"]
+VERBS = ["covers", "requires", "reduces", "tracks", "defines", "extends", "limits", "improves"]
+ADJECTIVES = ["annual", "regional", "detailed", "standard", "critical", "quarterly", "internal", "shared"]
+
+QUESTIONS = [f"What does the document say about {topic.lower()}?" for topic in TOPICS] + \
+            [f"Which {noun} is mentioned under {topic.lower()}?" for topic, noun in zip(TOPICS, NOUNS)]
+
+
+def sections(seed: int = 7, paragraphs: int = 3, sentences: int = 5) -> list:
+    """Return [(title, [paragraph, ...]), ...] with one section per topic."""
+    rng = random.Random(seed)
+    result = []
+    for topic in TOPICS:
+        body = []
+        for _ in range(paragraphs):
+            body.append(" ".join(
+                f"The {rng.choice(ADJECTIVES)} {topic.lower()} {rng.choice(NOUNS)} {rng.choice(VERBS)} "
+                f"the {rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} for each {rng.choice(NOUNS)}."
+                for _ in range(sentences)))
+        result.append((topic, body))
+    return result
+
+
+def _wrap(text: str, width: int) -> list:
+    lines, line = [], ""
+    for word in text.split():
+        if line and len(line) + 1 + len(word) > width:
+            lines.append(line)
+            line = word
+        else:
+            line = f"{line} {word}" if line else word
+    if line:
+        lines.append(line)
+    return lines
+
+
+def document_lines(seed: int = 7, width: int = 90) -> list:
+    lines = []
+    for title, body in sections(seed):
+        lines += ["", title, ""]
+        for paragraph in body:
+            lines += _wrap(paragraph, width) + [""]
+    return lines
+
+
+def write_pdf(path: str, pages: int = 24, seed: int = 7):
+    """Write a born-digital PDF (Helvetica text layer) by hand, repeating the sections to fill pages."""
+    lines = document_lines(seed)
+    lines_per_page = 46
+    while len(lines) < pages * lines_per_page:
+        lines += document_lines(seed + len(lines))
+
+    def escape(text):
+        return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+    # Objects 1-3 are the catalog, page tree and font; each page adds a page and a content object.
+    objects = {3: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"}
+    page_ids = []
+    for page in range(pages):
+        page_id, content_id = 4 + 2 * page, 5 + 2 * page
+        page_lines = lines[page * lines_per_page:(page + 1) * lines_per_page]
+        stream = "BT /F1 11 Tf 14 TL 56 770 Td " + " ".join(f"({escape(line)}) Tj T*" for line in page_lines)
+        stream += f" ET BT /F1 9 Tf 290 30 Td (Page {page + 1}) Tj ET"
+        data = stream.encode("latin-1")
+        objects[content_id] = b"<< /Length %d >>\nstream\n" % len(data) + data + b"\nendstream"
+        objects[page_id] = (b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id)
+        page_ids.append(page_id)
+    objects[1] = b"<< /Type /Catalog /Pages 2 0 R >>"
+    objects[2] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        " ".join(f"{i} 0 R" for i in page_ids).encode(), pages)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = {}
+    for obj_id in sorted(objects):
+        offsets[obj_id] = len(out)
+        out += b"%d 0 obj\n" % obj_id + objects[obj_id] + b"\nendobj\n"
+    xref_at = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for obj_id in sorted(objects):
+        out += b"%010d 00000 n \n" % offsets[obj_id]
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref_at)
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def write_docx(path: str, seed: int = 7):
+    from docx import Document
+    document = Document()
+    for title, body in sections(seed):
+        document.add_heading(title, level=1)
+        for paragraph in body:
+            document.add_paragraph(paragraph)
+    document.save(path)
+
+
+def write_image(path: str, seed: int = 7):
+    """Render two sections as black text on a white A4-sized page, for OCR."""
+    from PIL import Image, ImageDraw, ImageFont
+    image = Image.new("RGB", (1240, 1754), "white")
+    draw = ImageDraw.Draw(image)
+    font = ImageFont.load_default(size=28)
+    y = 80
+    for title, body in sections(seed)[:2]:
+        draw.text((80, y), title, fill="black", font=font)
+        y += 60
+        for line in _wrap(" ".join(body[:2]), 70):
+            draw.text((80, y), line, fill="black", font=font)
+            y += 38
+        y += 40
+    image.save(path)
+
+
+def write_audio(path: str, seconds: int = 60, seed: int = 7, rate: int = 16000):
+    """Write mono 16-bit PCM: tone bursts of 1-3 s separated by 0.6-1.5 s silences."""
+    rng = random.Random(seed)
+    frames = bytearray()
+    total = seconds * rate
+    while len(frames) // 2 < total:
+        tone = int(rng.uniform(1, 3) * rate)
+        freq = rng.choice([220, 330, 440, 550])
+        frames += b"".join(struct.pack("<h", int(8000 * math.sin(2 * math.pi * freq * i / rate)))
+                           for i in range(tone))
+        frames += b"\x00\x00" * int(rng.uniform(0.6, 1.5) * rate)
+    with wave.open(path, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(rate)
+        f.writeframes(bytes(frames[:total * 2]))
+
+
+FILE_NAMES = {"pdf": "report.pdf", "docx": "handbook.docx", "image": "scan.png", "audio": "meeting.wav"}
+
+
+def write_fixture(kind: str, path: str, seed: int = 7, pdf_pages: int = 24, audio_seconds: int = 60):
+    if kind == "pdf":
+        write_pdf(path, pdf_pages, seed)
+    elif kind == "docx":
+        write_docx(path, seed)
+    elif kind == "image":
+        write_image(path, seed)
+    elif kind == "audio":
+        write_audio(path, audio_seconds, seed)
+    else:
+        raise ValueError(f"Unknown fixture kind: {kind}")
+
+
+def generate(output_dir: str, pdf_pages: int = 24, audio_seconds: int = 60, seed: int = 7) -> dict:
+    """Write every fixture into output_dir and return {kind: path}."""
+    os.makedirs(output_dir, exist_ok=True)
+    paths = {kind: os.path.join(output_dir, name) for kind, name in FILE_NAMES.items()}
+    for kind, path in paths.items():
+        write_fixture(kind, path, seed, pdf_pages, audio_seconds)
+    return paths
+
+
+def generate_uploads(output_dir: str, kinds: list, count: int, pdf_pages: int = 24, audio_seconds: int = 60,
+                     seed: int = 7) -> list:
+    """
+    Write count fixtures, cycling through kinds, and return [(kind, path), ...]. Upload i
+    is seeded with seed + i, so repeated kinds never hit the ingest or OCR cache.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    uploads = []
+    for i in range(count):
+        kind = kinds[i % len(kinds)]
+        path = os.path.join(output_dir, f"{i:03d}-{FILE_NAMES[kind]}")
+        write_fixture(kind, path, seed + i, pdf_pages, audio_seconds)
+        uploads.append((kind, path))
+    return uploads
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("output_dir")
+    parser.add_argument("--pdf-pages", type=int, default=24)
+    parser.add_argument("--audio-seconds", type=int, default=60)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    for kind, path in generate(args.output_dir, args.pdf_pages, args.audio_seconds, args.seed).items():
+        print(f"{kind:6} {path} ({os.path.getsize(path)} bytes)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
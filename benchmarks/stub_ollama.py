@@ -0,0 +1,159 @@
+# benchmarks/stub_ollama.py
+"""
+A stand-in for the Ollama HTTP API with a configurable first-token latency and token rate.
+
+Usage (from the repository root):
+    python -m benchmarks.stub_ollama [--port 11435] [--latency-ms 300] [--tokens-per-second 40] [--tokens 64]
+
+Serves GET /api/tags plus POST /api/generate and /api/chat, streamed as NDJSON
+(or as a single JSON object with "stream": false). The answer is filler text,
+so benchmarks measure the API's own overhead and concurrency without a GPU or
+a pulled model. Responses use HTTP/1.1 chunked encoding, so clients can keep
+connections alive. The server is threaded and can hold many generations at once.
+"""
+import argparse
+import json
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FILLER = ("Based on the provided context the document describes the relevant section in detail "
+          "and the answer follows from the listed terms ").split()
+
+
+class StubOllama:
+    def __init__(self, model: str = "llama3.2", latency_ms: float = 300, tokens_per_second: float = 40,
+                 tokens: int = 64):
+        self.model = model
+        self.latency = latency_ms / 1000
+        self.token_interval = 1 / tokens_per_second if tokens_per_second > 0 else 0
+        self.tokens = tokens
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        self._server = None
+
+    def _begin(self):
+        with self._lock:
+            self.requests += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def _end(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def generate_tokens(self):
+        """Yield answer tokens at the configured pace, after the first-token latency."""
+        time.sleep(self.latency)
+        for i in range(self.tokens):
+            if i:
+                time.sleep(self.token_interval)
+            yield ("" if i == 0 else " ") + FILLER[i % len(FILLER)]
+
+    def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Serve in a daemon thread and return the base URL."""
+        handler = type("Handler", (_Handler,), {"stub": self})
+        self._server = ThreadingHTTPServer((host, port), handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="stub-ollama", daemon=True).start()
+        return f"http://{host}:{self._server.server_address[1]}"
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    stub = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, payload: dict, status: int = 200):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/api/tags":
+            self._send_json({"models": [{"name": f"{self.stub.model}:latest", "model": f"{self.stub.model}:latest"}]})
+        elif self.path in ("/", "/api/version"):
+            self._send_json({"version": "stub"})
+        else:
+            self._send_json({"error": "not found"}, status=404)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        request = json.loads(self.rfile.read(length) or b"{}")
+        if self.path == "/api/generate":
+            key = "response"
+        elif self.path == "/api/chat":
+            key = "message"
+        else:
+            self._send_json({"error": "not found"}, status=404)
+            return
+
+        def part(token, done):
+            payload = {"model": request.get("model", self.stub.model),
+                       "created_at": datetime.now(timezone.utc).isoformat(), "done": done}
+            payload[key] = token if key == "response" else {"role": "assistant", "content": token}
+            if done:
+                payload.update(done_reason="stop", eval_count=self.stub.tokens)
+            return payload
+
+        self.stub._begin()
+        try:
+            if not request.get("stream", True):
+                self._send_json(part("".join(self.stub.generate_tokens()), True))
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for token in self.stub.generate_tokens():
+                self._write_chunk(part(token, False))
+            self._write_chunk(part("", True))
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # The client stopped reading, e.g. a cancelled /ask/stream.
+            self.close_connection = True
+        finally:
+            self.stub._end()
+
+    def _write_chunk(self, payload: dict):
+        data = json.dumps(payload).encode() + b"\n"
+        self.wfile.write(b"%X\r\n" % len(data) + data + b"\r\n")
+        self.wfile.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--model", default="llama3.2")
+    parser.add_argument("--latency-ms", type=float, default=300, help="delay before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=40)
+    parser.add_argument("--tokens", type=int, default=64, help="tokens per answer")
+    args = parser.parse_args()
+    stub = StubOllama(args.model, args.latency_ms, args.tokens_per_second, args.tokens)
+    print(f"Stub Ollama serving on {stub.start(args.host, args.port)}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        stub.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,141 @@
+# chunking.py
+import re
+import logging
+
+import config
+
+app_logger = logging.getLogger("DocumentAI")
+app_logger.setLevel(logging.INFO)
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+
+# An ASCII word is estimated at one word piece plus one per this many characters.
+WORD_PIECE_CHARS = 6
+
+
+def count_tokens(text: str) -> int:
+    """
+    Estimate the MiniLM word pieces in text, erring high: a punctuation mark counts
+    one, an ASCII word one plus one per WORD_PIECE_CHARS characters (long and rare
+    words split into pieces), and any other word one per character (CJK is split per
+    character). Overcounting keeps packed chunks inside the model's 256-piece limit,
+    past which the embedder silently truncates them.
+    """
+    count = 0
+    for token in _TOKEN_RE.findall(text):
+        count += 1 + len(token) // WORD_PIECE_CHARS if token.isascii() else len(token)
+    return count
+
+
+def pack_texts(texts: list, max_tokens: int = None, overlap_tokens: int = None) -> list:
+    """
+    Pack consecutive texts into windows of at most max_tokens, never cutting a word.
+
+    Texts that fit in a window are kept whole; longer ones are split on word
+    boundaries. Each new window starts with the last overlap_tokens of the
+    previous one.
+    """
+    max_tokens = config.CHUNK_MAX_TOKENS if max_tokens is None else max_tokens
+    overlap_tokens = config.CHUNK_OVERLAP_TOKENS if overlap_tokens is None else overlap_tokens
+    overlap_tokens = min(overlap_tokens, max_tokens // 2)
+
+    windows = []
+    words, counts = [], []
+    total = 0
+    fresh = 0  # words added since the last flush
+
+    def flush():
+        nonlocal words, counts, total, fresh
+        if fresh:
+            windows.append(" ".join(words))
+            keep, kept_total = 0, 0
+            for count in reversed(counts):
+                if kept_total + count > overlap_tokens:
+                    break
+                kept_total += count
+                keep += 1
+            words, counts = (words[-keep:], counts[-keep:]) if keep else ([], [])
+            total = kept_total
+        fresh = 0
+
+    def drop_overlap():
+        nonlocal words, counts, total
+        words, counts, total = [], [], 0
+
+    for text in texts:
+        unit_words = text.split()
+        unit_counts = [max(count_tokens(word), 1) for word in unit_words]
+        unit_total = sum(unit_counts)
+        if unit_total <= max_tokens and total + unit_total > max_tokens:
+            # Start a new window so the text stays whole.
+            flush()
+            if total + unit_total > max_tokens:
+                drop_overlap()
+        for word, count in zip(unit_words, unit_counts):
+            if total + count > max_tokens:
+                if fresh:
+                    flush()
+                if total + count > max_tokens:
+                    drop_overlap()
+            words.append(word)
+            counts.append(count)
+            total += count
+            fresh += 1
+    flush()
+    return windows
+
+
+def chunk_elements(elements: list, max_tokens: int = None, overlap_tokens: int = None) -> list:
+    """
+    Turn per-element chunk dicts from unstructured into retrieval chunks.
+
+    Boilerplate types (config.CHUNK_DROP_TYPES) are dropped. Each Title is kept as
+    its own chunk, and a run of Titles with no text between them becomes one heading.
+    The elements under a title are packed with pack_texts into "Text" chunks, so
+    add_chunks_to_vector_store still links them to the title. Each body chunk keeps
+    the metadata of its section's first element.
+    """
+    max_tokens = config.CHUNK_MAX_TOKENS if max_tokens is None else max_tokens
+    chunks = []
+    title = None
+    body_texts = []
+    body_meta = None
+
+    def flush_section():
+        nonlocal title, body_texts, body_meta
+        if title is not None:
+            chunks.append(title)
+        for window in pack_texts(body_texts, max_tokens, overlap_tokens):
+            chunks.append({**body_meta, "text": window, "type": "Text"})
+        title, body_texts, body_meta = None, [], None
+
+    for element in elements:
+        element_type = element.get("type", "")
+        text = (element.get("text") or "").strip()
+        if not text or element_type in config.CHUNK_DROP_TYPES:
+            continue
+        if element_type == "Title":
+            if (title is not None and not body_texts
+                    and count_tokens(title["text"]) + count_tokens(text) <= config.CHUNK_MAX_TITLE_TOKENS):
+                title["text"] = f"{title['text']}\n{text}"
+                continue
+            flush_section()
+            title = {**element, "text": text}
+        else:
+            if body_meta is None:
+                body_meta = element
+            body_texts.append(text)
+    flush_section()
+
+    app_logger.info("[CHUNKING]: Packed %d elements into %d chunks", len(elements), len(chunks))
+    return chunks
+
+
+def chunk_text(text: str, source: str, chunk_type: str, max_tokens: int = None, overlap_tokens: int = None) -> list:
+    """Split plain text (e.g. a transcript) on sentence boundaries and pack it into chunks."""
+    sentences = [s for s in _SENTENCE_RE.split(text) if s.strip()]
+    return [
+        {"text": window, "source": source, "type": chunk_type}
+        for window in pack_texts(sentences, max_tokens, overlap_tokens)
+    ]
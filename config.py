@@ -3,4 +3,97 @@
 VECTOR_STORE_PATH = "chroma_store"
 SESSION_TIMEOUT_SECONDS = 3600  # 1 hour
 EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+EMBEDDING_BACKEND = "torch"  # "torch" (sentence-transformers) or "onnx" (int8 ONNX via onnxruntime)
+EMBEDDING_ONNX_PATH = "onnx_models/all-MiniLM-L6-v2"  # Written by export_onnx_embedder.py
+EMBEDDING_ONNX_THREADS = 0  # onnxruntime intra-op threads; 0 lets onnxruntime choose
 OLLAMA_MODEL = "llama3.2"  # Or "llama2", etc.
+OLLAMA_BASE_URL = "http://localhost:11434"
+
+# LLM dispatcher
+LLM_MAX_CONCURRENT = 4  # Generations sent to Ollama at once; match OLLAMA_NUM_PARALLEL
+LLM_MAX_QUEUE = 16  # Requests allowed to wait for a slot; beyond this /ask answers 429
+LLM_RETRY_AFTER_SECONDS = 5  # Retry-After estimate until generation times have been observed
+LLM_KEEPALIVE_SECONDS = 60  # How long idle pooled connections to Ollama stay open
+
+# Background ingestion
+INGEST_MAX_WORKERS = 2  # Worker processes for partition/transcription
+INGEST_MAX_CONCURRENT_JOBS = 4  # Jobs allowed to run at once; the rest wait their turn
+JOB_RETENTION_SECONDS = 3600  # How long finished jobs stay queryable via /jobs/{id}
+JOB_HEARTBEAT_SECONDS = 15  # How often a worker refreshes the heartbeat of the jobs it is running
+JOB_STALE_SECONDS = 120  # A pending job without a heartbeat for this long (its worker died) stops holding /ask at 202
+
+# Uploads
+TEMP_DIR = "temp"
+MAX_UPLOAD_BYTES = 200 * 1024 * 1024  # 200 MB; larger uploads are rejected with 413
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # Bytes read per chunk while streaming an upload to disk
+UPLOAD_MAX_FILES = 20  # Files accepted by one /upload/batch request
+
+# Ingest cache (content hash -> chunks + embeddings)
+INGEST_CACHE_MAX_CHUNKS = 20000  # Total chunks kept across all cached files before LRU eviction
+
+# Shared embedding service
+EMBEDDING_BATCH_SIZE = 64  # Max texts encoded in one forward pass
+EMBEDDING_MAX_WAIT_MS = 10  # How long to wait for concurrent embed calls to join a batch
+
+# Retrieval
+NEIGHBOR_WINDOW = 1  # Same-section text chunks pulled in on either side of a matching hit
+RETRIEVAL_OVERFETCH = 3  # Vector and BM25 candidates fetched per requested result
+RRF_K = 60  # Reciprocal-rank fusion constant
+LEXICAL_INDEX_PATH = "lexical_store"  # Per-session BM25 indexes, next to VECTOR_STORE_PATH
+LEXICAL_CACHE_SESSIONS = 128  # Session indexes kept loaded in memory
+
+# Answer cache for /ask
+ANSWER_CACHE_MAX_ENTRIES = 1000  # LRU bound across all sessions
+ANSWER_CACHE_TTL_SECONDS = 900  # Cached answers expire after 15 minutes
+ANSWER_CACHE_SEMANTIC = False  # Also match reworded questions by embedding similarity (same numbers and names required)
+ANSWER_CACHE_SIMILARITY_THRESHOLD = 0.95  # Minimum cosine similarity for a semantic hit
+
+# Chunking
+CHUNK_MAX_TOKENS = 200  # Estimated word pieces per packed chunk; the estimate runs high, so chunks stay under MiniLM's 256
+CHUNK_OVERLAP_TOKENS = 20  # Tokens repeated at the start of the next chunk of the same section
+CHUNK_MAX_TITLE_TOKENS = 32  # Consecutive titles are joined into one heading up to this size
+CHUNK_DROP_TYPES = {"Header", "Footer", "PageNumber", "PageBreak"}  # Boilerplate element types
+
+# Session lifecycle
+SESSION_COMPACTION_INTERVAL_SECONDS = 300  # How often expired sessions are purged
+SESSION_PURGE_BATCH_SIZE = 500  # Vectors deleted per Chroma call when purging a session
+
+# Session store
+SESSION_STORE = "sqlite"  # "sqlite" (shared by all workers on the host) or "memory" (single worker)
+SESSION_DB_PATH = "sessions.db"
+SESSION_CACHE_SECONDS = 5  # How long a worker trusts a cached "session is valid" read
+SESSION_CACHE_MAX_ENTRIES = 10000
+
+# Vector store layout
+VECTOR_STORE_LAYOUT = "global"  # "global" (one collection), "session" (one per session) or "bucket"
+VECTOR_STORE_BUCKETS = 64  # Hash buckets for the "bucket" layout
+COLLECTION_CACHE_SIZE = 256  # Collection handles kept open (LRU)
+
+# Start-up
+WARM_UP_ON_STARTUP = True  # Load models in the background after the server binds its port
+WARM_UP_RETRY_SECONDS = 5  # First delay before a failed component (e.g. Ollama not up yet) is retried
+WARM_UP_RETRY_MAX_SECONDS = 60  # Retry delay doubles up to this
+
+# Audio transcription
+AUDIO_SEGMENT_SECONDS = 120  # Target length of each window transcribed in parallel
+AUDIO_SPLIT_ON_SILENCE = True  # Move cuts to nearby silences instead of fixed offsets
+AUDIO_SILENCE_TOLERANCE_SECONDS = 20  # How far from the target a silence may be used as a cut
+AUDIO_SILENCE_NOISE_DB = -30  # silencedetect threshold
+AUDIO_SILENCE_MIN_SECONDS = 0.5  # Minimum silence length to cut on
+
+# PDF partitioning
+PDF_STRATEGY = "auto"  # "auto", "fast" (text layer), "hi_res" or "ocr_only"; overridable per upload
+PDF_OCR_STRATEGY = "ocr_only"  # What "auto" uses for PDFs without a usable text layer
+PDF_TEXT_LAYER_MIN_CHARS = 100  # Average extractable characters per page for a PDF to count as born-digital
+PDF_PAGES_PER_SEGMENT = 20  # Pages partitioned per worker task
+
+# Image OCR
+OCR_TARGET_DPI = 300  # Scans above this resolution are downscaled to it before OCR
+OCR_MAX_SIDE = 4000  # Long-side cap in pixels, also for images without DPI information
+OCR_GRAYSCALE = True  # OCR a grayscale copy; Tesseract binarizes anyway
+OCR_HASH_SIZE = 16  # Perceptual hash grid (256 bits); only locates the cache entry, the exact pixels must match too
+OCR_CACHE_PATH = "ocr_cache.db"  # Shared by the ingest workers
+OCR_CACHE_MAX_ENTRIES = 10000  # Pages kept before LRU eviction
+
+# Observability
+LOG_PAYLOAD_SAMPLE_RATE = 0.0  # Fraction of requests that log queries, raw results and chunk previews at INFO
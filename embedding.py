@@ -0,0 +1,183 @@
+# embedding.py
+import json
+import os
+import queue
+import threading
+import time
+import logging
+from concurrent.futures import Future
+
+import config
+
+app_logger = logging.getLogger("DocumentAI")
+app_logger.setLevel(logging.INFO)
+
+
+class _EmbedRequest:
+    __slots__ = ("texts", "offset", "vectors", "future")
+
+    def __init__(self, texts):
+        self.texts = texts
+        self.offset = 0
+        self.vectors = []
+        self.future = Future()
+
+    @property
+    def remaining(self):
+        return len(self.texts) - self.offset
+
+
+class OnnxEmbedder:
+    """
+    The embedding model exported to ONNX (int8-quantized by default) and run with
+    onnxruntime on CPU. Tokenization, mean pooling and normalization match the
+    sentence-transformers pipeline, and encode() mirrors SentenceTransformer.encode.
+    """
+
+    def __init__(self, path: str, threads: int = 0):
+        import numpy as np
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        settings_path = os.path.join(path, "embedder.json")
+        if not os.path.exists(settings_path):
+            raise FileNotFoundError(f"No exported ONNX embedder in {path}; run python export_onnx_embedder.py")
+        with open(settings_path, "r", encoding="utf-8") as f:
+            settings = json.load(f)
+        self._np = np
+        self.normalize = settings["normalize"]
+        self.dimension = settings["dimension"]
+        self.tokenizer = Tokenizer.from_file(os.path.join(path, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=settings["max_seq_length"])
+        self.tokenizer.enable_padding(pad_id=settings["pad_token_id"], pad_token=settings["pad_token"])
+        options = onnxruntime.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(os.path.join(path, settings["model_file"]), options,
+                                                    providers=["CPUExecutionProvider"])
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+
+    def encode(self, texts: list, batch_size: int = 32, **kwargs):
+        np = self._np
+        vectors = []
+        for start in range(0, len(texts), batch_size):
+            encodings = self.tokenizer.encode_batch(list(texts[start:start + batch_size]))
+            input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+            attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+            feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+            if "token_type_ids" in self.input_names:
+                feeds["token_type_ids"] = np.zeros_like(input_ids)
+            hidden = self.session.run(None, feeds)[0]
+            # Mean over the real tokens only, as the sentence-transformers Pooling layer does.
+            mask = attention_mask[..., None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            if self.normalize:
+                pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+            vectors.append(pooled.astype(np.float32))
+        return np.concatenate(vectors) if vectors else np.zeros((0, self.dimension), dtype=np.float32)
+
+
+def load_embedder(backend: str = None):
+    """Load the embedding model for a backend (config.EMBEDDING_BACKEND by default)."""
+    backend = backend or config.EMBEDDING_BACKEND
+    if backend == "onnx":
+        app_logger.info("[EMBEDDING]: Loading ONNX embedding model from %s", config.EMBEDDING_ONNX_PATH)
+        return OnnxEmbedder(config.EMBEDDING_ONNX_PATH, threads=config.EMBEDDING_ONNX_THREADS)
+    if backend == "torch":
+        from sentence_transformers import SentenceTransformer
+        app_logger.info("[EMBEDDING]: Loading embedding model %s", config.EMBEDDING_MODEL)
+        return SentenceTransformer(config.EMBEDDING_MODEL)
+    raise ValueError(f"Unknown EMBEDDING_BACKEND: {backend}")
+
+
+class EmbeddingService:
+    """
+    Owns the single embedding model of the process and micro-batches concurrent
+    embed() calls from any thread into shared forward passes.
+
+    A worker thread collects requests for up to max_wait seconds (or until a full
+    batch is available) and encodes them together. Large requests are fed through
+    in batch_size slices, smallest remaining request first, so a query embedding
+    never waits behind a whole document.
+    """
+
+    def __init__(self, backend: str, batch_size: int, max_wait: float):
+        self.backend = backend
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self._model = None
+        self._queue = queue.Queue()
+        self._worker = None
+        self._lock = threading.Lock()
+
+    def _get_model(self):
+        if self._model is None:
+            self._model = load_embedder(self.backend)
+        return self._model
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+                self._worker.start()
+
+    def embed(self, texts: list) -> list:
+        """Embed texts and return one vector per text, in order. Blocks the calling thread."""
+        if not texts:
+            return []
+        self._ensure_worker()
+        request = _EmbedRequest(list(texts))
+        self._queue.put(request)
+        return request.future.result()
+
+    def _collect(self, pending: list):
+        if not pending:
+            pending.append(self._queue.get())
+        deadline = time.monotonic() + self.max_wait
+        while sum(r.remaining for r in pending) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                pending.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+
+    def _run(self):
+        pending = []
+        while True:
+            self._collect(pending)
+            pending.sort(key=lambda r: r.remaining)
+
+            batch, slices = [], []
+            for request in pending:
+                take = min(self.batch_size - len(batch), request.remaining)
+                if take <= 0:
+                    break
+                batch.extend(request.texts[request.offset:request.offset + take])
+                slices.append((request, take))
+
+            try:
+                vectors = self._get_model().encode(batch, batch_size=self.batch_size, convert_to_numpy=True)
+            except Exception as e:
+                app_logger.error("[EMBEDDING]: Batch of %d texts failed: %s", len(batch), str(e))
+                for request, _ in slices:
+                    request.future.set_exception(e)
+                    pending.remove(request)
+                continue
+
+            start = 0
+            for request, take in slices:
+                request.vectors.extend(vectors[start:start + take])
+                request.offset += take
+                start += take
+                if request.remaining == 0:
+                    request.future.set_result(request.vectors)
+                    pending.remove(request)
+
+
+embedding_service = EmbeddingService(
+    config.EMBEDDING_BACKEND,
+    batch_size=config.EMBEDDING_BATCH_SIZE,
+    max_wait=config.EMBEDDING_MAX_WAIT_MS / 1000,
+)
@@ -0,0 +1,90 @@
+# export_onnx_embedder.py
+"""
+Export EMBEDDING_MODEL to ONNX and quantize it to int8, for EMBEDDING_BACKEND = "onnx".
+
+Usage:
+    python export_onnx_embedder.py [--output onnx_models/all-MiniLM-L6-v2] [--no-quantize] [--opset 17]
+
+The transformer is exported with dynamic batch and sequence axes. Its weights are
+then quantized to int8 with onnxruntime's dynamic quantization. The tokenizer and
+the pooling settings are saved next to it, so the server needs neither PyTorch
+nor transformers at run time. Check retrieval parity before switching with
+python -m benchmarks.bench_embedding_backends. Stored vectors do not need to be
+re-embedded: both backends produce vectors of the same model.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import config
+
+
+def export(model_name: str, output: str, quantize: bool, opset: int) -> str:
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer(model_name, device="cpu")
+    transformer, pooling = model[0], model[1]
+    if not getattr(pooling, "pooling_mode_mean_tokens", False):
+        raise SystemExit(f"{model_name} does not use mean pooling, which is all OnnxEmbedder implements")
+    hf_model = transformer.auto_model.eval()
+    tokenizer = transformer.tokenizer
+
+    os.makedirs(output, exist_ok=True)
+    example = tokenizer(["An example sentence for tracing."], return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in example]
+
+    class LastHiddenState(torch.nn.Module):
+        def forward(self, *inputs):
+            return hf_model(**dict(zip(input_names, inputs))).last_hidden_state
+
+    fp32_path = os.path.join(output, "model.onnx")
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names + ["last_hidden_state"]}
+    started = time.perf_counter()
+    with torch.no_grad():
+        torch.onnx.export(LastHiddenState(), tuple(example[name] for name in input_names), fp32_path,
+                          input_names=input_names, output_names=["last_hidden_state"],
+                          dynamic_axes=dynamic_axes, opset_version=opset)
+    print(f"Exported {model_name} to {fp32_path} in {time.perf_counter() - started:.1f}s")
+
+    model_file = "model.onnx"
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        model_file = "model.int8.onnx"
+        quantize_dynamic(fp32_path, os.path.join(output, model_file), weight_type=QuantType.QInt8)
+        print(f"Quantized to {os.path.join(output, model_file)} "
+              f"({os.path.getsize(fp32_path) / 2**20:.0f} MB -> "
+              f"{os.path.getsize(os.path.join(output, model_file)) / 2**20:.0f} MB)")
+
+    tokenizer.save_pretrained(output)
+    settings = {
+        "model": model_name,
+        "model_file": model_file,
+        "quantized": quantize,
+        "max_seq_length": model.max_seq_length,
+        "normalize": any(type(module).__name__ == "Normalize" for module in model),
+        "pad_token": tokenizer.pad_token,
+        "pad_token_id": tokenizer.pad_token_id,
+        "dimension": model.get_sentence_embedding_dimension(),
+    }
+    with open(os.path.join(output, "embedder.json"), "w", encoding="utf-8") as f:
+        json.dump(settings, f, indent=2)
+    return output
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=config.EMBEDDING_MODEL)
+    parser.add_argument("--output", default=config.EMBEDDING_ONNX_PATH)
+    parser.add_argument("--no-quantize", action="store_true", help="keep float32 weights")
+    parser.add_argument("--opset", type=int, default=17)
+    args = parser.parse_args()
+    output = export(args.model, args.output, not args.no_quantize, args.opset)
+    print(f"Done. Set EMBEDDING_BACKEND = \"onnx\" and EMBEDDING_ONNX_PATH = \"{output}\" in config.py")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
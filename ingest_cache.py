@@ -0,0 +1,73 @@
+# ingest_cache.py
+import threading
+import logging
+from collections import OrderedDict
+
+import config
+
+app_logger = logging.getLogger("DocumentAI")
+app_logger.setLevel(logging.INFO)
+
+# Chunk keys that describe the upload rather than the file's content. They are not
+# cached; a hit gets the source of the upload that asked for it.
+UPLOAD_KEYS = ("source", "filename", "file_directory", "last_modified")
+
+
+class IngestCache:
+    """
+    LRU cache mapping the SHA-256 of an uploaded file to its partitioned chunks and
+    their embeddings, bounded by the total number of cached chunks. Only the content
+    of the chunks is kept, so a second upload of a file is cited under its own name.
+    """
+
+    def __init__(self, max_chunks: int):
+        self.max_chunks = max_chunks
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, file_hash: str, source: str):
+        """Return (chunks, embeddings) for file_hash with the chunks attributed to source, or None on a miss."""
+        with self._lock:
+            entry = self._entries.get(file_hash)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(file_hash)
+            self.hits += 1
+        chunks, embeddings = entry
+        return [{**chunk, "source": source} for chunk in chunks], embeddings
+
+    def put(self, file_hash: str, chunks: list, embeddings: list):
+        if not chunks or len(chunks) > self.max_chunks:
+            return
+        with self._lock:
+            old = self._entries.pop(file_hash, None)
+            if old is not None:
+                self._size -= len(old[0])
+            self._entries[file_hash] = ([{key: value for key, value in chunk.items() if key not in UPLOAD_KEYS}
+                                         for chunk in chunks], embeddings)
+            self._size += len(chunks)
+            while self._size > self.max_chunks:
+                _, (evicted_chunks, _) = self._entries.popitem(last=False)
+                self._size -= len(evicted_chunks)
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "chunks": self._size,
+                "max_chunks": self.max_chunks,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+ingest_cache = IngestCache(config.INGEST_CACHE_MAX_CHUNKS)
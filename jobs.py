@@ -0,0 +1,432 @@
+# jobs.py
+import asyncio
+import copy
+import functools
+import multiprocessing
+import os
+import time
+import uuid
+import logging
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import config
+import telemetry
+from agents.warmup import apply_config
+from ingest_cache import ingest_cache
+from processing import remove_upload
+from session import (add_pending_job, finish_pending_job, has_pending_jobs, heartbeat_pending_jobs, is_valid_session,
+                     load_job, save_job)
+from vector_store import add_chunks_to_vector_store, add_sources_to_vector_store
+
+app_logger = logging.getLogger("DocumentAI")
+app_logger.setLevel(logging.INFO)
+
+# job_id -> job dict (see create_job for the fields) for the jobs of this process that
+# have not finished. Every change is copied to the session store, where GET /jobs/{job_id}
+# on any worker reads it.
+jobs = {}
+
+# One writer thread, so a job's changes reach the session store in order and off the event loop.
+_job_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="job-writer")
+
+_executor = None
+_semaphore = None
+
+# Ids of jobs whose background task has started in this process; only these get heartbeats.
+_running = set()
+
+# Stage name under which each file type's worker-side processing is timed.
+PROCESS_STAGES = {"document": "partition", "image": "ocr", "audio": "transcribe"}
+
+
+def get_executor():
+    """Return the shared process pool used for partition/transcription."""
+    global _executor
+    if _executor is None:
+        # spawn, not fork: the parent runs model and batching threads that must not be forked.
+        # Spawned workers re-import config, so the parent's current values are handed over.
+        settings = {name: getattr(config, name) for name in dir(config) if name.isupper()}
+        _executor = ProcessPoolExecutor(max_workers=config.INGEST_MAX_WORKERS,
+                                        mp_context=multiprocessing.get_context("spawn"),
+                                        initializer=apply_config, initargs=(settings,))
+    return _executor
+
+
+def _discard_executor(executor):
+    """Drop a broken pool so the next call starts fresh workers."""
+    global _executor
+    if _executor is executor:
+        _executor = None
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def run_in_pool(fn, *args):
+    """
+    Run fn(*args) in the process pool. If a worker died (e.g. OOM-killed during hi_res
+    partitioning or Whisper), the pool is broken for every later call: replace it and
+    retry this call once on fresh workers, so only the call that keeps killing its
+    worker fails.
+    """
+    loop = asyncio.get_running_loop()
+    for attempt in range(2):
+        executor = get_executor()
+        try:
+            return await loop.run_in_executor(executor, fn, *args)
+        except BrokenProcessPool:
+            _discard_executor(executor)
+            if attempt:
+                raise
+            app_logger.warning("[JOBS]: Ingest worker died, restarting the pool and retrying")
+
+
+def _get_semaphore():
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(config.INGEST_MAX_CONCURRENT_JOBS)
+    return _semaphore
+
+
+def warm_up_workers() -> int:
+    """
+    Start every ingest worker process and have it import unstructured and load Whisper.
+    Best effort: the pool decides which worker runs each warm-up call. Returns how many
+    distinct workers were warmed. A pool broken by a worker dying here is discarded,
+    so the next warm-up retry starts fresh workers.
+    """
+    from agents.warmup import warm_up_worker
+    executor = get_executor()
+    try:
+        futures = [executor.submit(warm_up_worker) for _ in range(config.INGEST_MAX_WORKERS)]
+        return len({future.result() for future in futures})
+    except BrokenProcessPool:
+        _discard_executor(executor)
+        raise
+
+
+def shutdown_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def create_job(session_id: str, filename: str, file_type: str, file_hash: str = None, files: list = None) -> str:
+    """
+    Register a queued job. For a batch upload, pass files as [(filename, file_type), ...]:
+    each file then gets its own status entry and the job's progress is their average.
+    Writes to the session store, so call it from a thread.
+    """
+    job_id = str(uuid.uuid4())
+    now = time.time()
+    jobs[job_id] = {
+        "job_id": job_id,
+        "session_id": session_id,
+        "filename": filename,
+        "file_type": file_type,
+        "file_hash": file_hash,
+        "cache_hit": False,
+        "status": "queued",
+        "progress": 0.0,
+        "chunks": 0,
+        "error": None,
+        "created_at": now,
+        "updated_at": now,
+    }
+    if files is not None:
+        jobs[job_id]["files"] = [{"filename": name, "file_type": kind, "cache_hit": False, "status": "queued",
+                                  "progress": 0.0, "chunks": 0, "error": None} for name, kind in files]
+    add_pending_job(session_id, job_id)
+    save_job(jobs[job_id])
+    return job_id
+
+
+def get_job(job_id: str):
+    """The job's status, from this process if it runs the job, else from the session store."""
+    return jobs.get(job_id) or load_job(job_id)
+
+
+def _publish(job: dict):
+    _job_writer.submit(save_job, copy.deepcopy(job))
+
+
+def _finish_job(job_id: str):
+    # Runs on the writer after the job's last save, so the stored status is final by now.
+    finish_pending_job(job_id)
+    jobs.pop(job_id, None)
+
+
+def update_job(job_id: str, **fields):
+    job = jobs.get(job_id)
+    if job is not None:
+        job.update(fields)
+        job["updated_at"] = time.time()
+        _publish(job)
+
+
+def update_file(job_id: str, index: int, **fields):
+    """Update one file of a batch job and roll its progress and chunk count up into the job."""
+    job = jobs.get(job_id)
+    if job is None:
+        return
+    files = job["files"]
+    files[index].update(fields)
+    job["progress"] = 0.9 * sum(f["progress"] for f in files) / len(files)
+    job["chunks"] = sum(f["chunks"] for f in files)
+    job["updated_at"] = time.time()
+    _publish(job)
+
+
+def session_has_pending_jobs(session_id: str) -> bool:
+    # Tracked in the session store so every worker sees jobs started by any other.
+    return has_pending_jobs(session_id)
+
+
+def heartbeat_jobs():
+    """
+    Refresh the heartbeat of every job running in this process. A job whose worker
+    died, or whose background task never started, stops counting as pending after
+    JOB_STALE_SECONDS.
+    """
+    heartbeat_pending_jobs(list(_running))
+
+
+async def _run_segmented(job_id: str, session_id: str, file_path: str, segmenter, file_type: str,
+                         source_index: int = 0, update=None, index: bool = True):
+    """
+    Plan a file's segments and process them concurrently in the process pool.
+
+    segmenter is (plan_fn, segment_fn) or (plan_fn, segment_fn, merge_fn). plan_fn(file_path)
+    returns {"segments": [args, ...]} (plus "duration" in seconds for audio) and each
+    segment runs as segment_fn(file_path, *args). Once every segment has finished, the
+    results are joined in segment order (by merge_fn when given, so title linkage
+    follows the document) and indexed in one write, so chunk positions follow the
+    file and /ask, which waits for the whole job anyway, sees them all at once.
+    Returns (chunks, embeddings, failed): failed counts the segments that errored
+    (only tolerated without merge_fn); when it is non-zero the result has gaps and
+    must not be cached.
+
+    With index=False nothing is stored: the chunks come back in segment order with
+    embeddings None, for the caller to index (batch uploads index all files at once).
+    update receives the progress fields, by default for the job itself.
+    """
+    plan_fn, segment_fn = segmenter[0], segmenter[1]
+    merge_fn = segmenter[2] if len(segmenter) > 2 else None
+    update = update or functools.partial(update_job, job_id)
+    process_stage = PROCESS_STAGES.get(file_type, "process")
+    started = time.perf_counter()
+    with telemetry.timed("ingest", "plan"):
+        plan = await run_in_pool(plan_fn, file_path)
+    segments = plan["segments"]
+    update(segments=len(segments), segments_done=0,
+           **{key: plan[key] for key in ("duration", "pages", "strategy") if key in plan})
+
+    async def run_segment(index, args):
+        with telemetry.timed("ingest", process_stage):
+            return index, await run_in_pool(segment_fn, file_path, *args)
+
+    results = [None] * len(segments)
+    failed = 0
+    tasks = [run_segment(i, args) for i, args in enumerate(segments)]
+    for done, task in enumerate(asyncio.as_completed(tasks), 1):
+        try:
+            segment_index, segment_chunks = await task
+            results[segment_index] = segment_chunks
+        except Exception as e:
+            if merge_fn is not None:
+                raise
+            failed += 1
+            app_logger.error("[JOBS]: Job %s segment failed: %s", job_id, str(e))
+        update(status="processing", progress=0.1 + 0.8 * done / len(segments),
+               segments_done=done, segments_failed=failed)
+    if segments and failed == len(segments):
+        raise RuntimeError("All segments failed")
+
+    if merge_fn is not None:
+        with telemetry.timed("ingest", "merge"):
+            chunks = merge_fn(results)
+    else:
+        chunks = [chunk for segment_chunks in results if segment_chunks for chunk in segment_chunks]
+    update(status="indexing", progress=0.9, chunks=len(chunks))
+    embeddings = None
+    if index and chunks:
+        embeddings = await asyncio.to_thread(add_chunks_to_vector_store, session_id, chunks,
+                                             None, 0, source_index)
+
+    elapsed = time.perf_counter() - started
+    update(seconds=elapsed)
+    if plan.get("duration"):
+        rtf = elapsed / plan["duration"]
+        update(real_time_factor=rtf)
+        app_logger.info("[JOBS]: Job %s transcribed %.0fs of audio in %.1fs (real-time factor %.2f)",
+                        job_id, plan["duration"], elapsed, rtf)
+    else:
+        app_logger.info("[JOBS]: Job %s processed %d segments in %.1fs", job_id, len(segments), elapsed)
+    if failed:
+        update(warning=f"{failed} of {len(segments)} segments failed; their content is missing")
+    return chunks, embeddings, failed
+
+
+async def run_ingest_job(job_id: str, handler, file_path: str, segmenter=None, source_index: int = 0):
+    """
+    Run one ingestion job: the agent handler in the process pool, then
+    embedding + upsert in a thread so the event loop stays responsive.
+    With a segmenter (see _run_segmented), the file is split and its segments
+    are processed in parallel instead of calling handler.
+    Files already seen (same SHA-256) reuse the cached chunks and embeddings,
+    under this upload's file name and source slot, and skip both steps. The temp file is always removed, whatever the outcome.
+    source_index is the file's source slot in the session (see session.allocate_sources).
+    """
+    session_id = jobs[job_id]["session_id"]
+    file_hash = jobs[job_id]["file_hash"]
+    file_type = jobs[job_id]["file_type"]
+    queued_at = time.perf_counter()
+    _running.add(job_id)
+    try:
+        async with _get_semaphore():
+            started = time.perf_counter()
+            telemetry.observe_stage("ingest", "queue_wait", started - queued_at)
+            if not is_valid_session(session_id):
+                update_job(job_id, status="failed", error="Session expired or deleted before indexing")
+                telemetry.count_outcome("ingest", "session_gone")
+                return
+            cached = ingest_cache.get(file_hash, os.path.basename(file_path)) if file_hash else None
+            if cached is not None:
+                chunks, embeddings = cached
+                app_logger.info("[JOBS]: Job %s reusing cached ingest for %s", job_id, file_hash)
+                update_job(job_id, status="indexing", progress=0.6, chunks=len(chunks), cache_hit=True)
+                await asyncio.to_thread(add_chunks_to_vector_store, session_id, chunks, embeddings,
+                                        0, source_index)
+            elif segmenter is not None:
+                update_job(job_id, status="processing", progress=0.1)
+                app_logger.info("[JOBS]: Job %s processing %s in segments", job_id, file_path)
+                chunks, embeddings, failed = await _run_segmented(job_id, session_id, file_path, segmenter,
+                                                                  file_type, source_index)
+                if failed:
+                    # Keep the gaps out of the cache, so a re-upload processes the file again.
+                    update_job(job_id, partial=True)
+                elif chunks and file_hash:
+                    ingest_cache.put(file_hash, chunks, embeddings)
+            else:
+                update_job(job_id, status="processing", progress=0.1)
+                app_logger.info("[JOBS]: Job %s processing %s", job_id, file_path)
+                with telemetry.timed("ingest", PROCESS_STAGES.get(file_type, "process")):
+                    chunks, _ = await run_in_pool(handler, file_path, session_id)
+
+                update_job(job_id, status="indexing", progress=0.6, chunks=len(chunks))
+                if chunks:
+                    embeddings = await asyncio.to_thread(add_chunks_to_vector_store, session_id, chunks,
+                                                         None, 0, source_index)
+                    if file_hash:
+                        ingest_cache.put(file_hash, chunks, embeddings)
+
+            update_job(job_id, status="done", progress=1.0)
+            telemetry.observe_stage("ingest", "total", time.perf_counter() - started)
+            telemetry.observe_chunks("ingest", len(chunks))
+            telemetry.count_outcome("ingest", "cache_hit" if cached is not None
+                                    else "partial" if jobs[job_id].get("partial") else "done")
+            app_logger.info("[JOBS]: Job %s done with %d chunks", job_id, len(chunks))
+    except Exception as e:
+        app_logger.error("[JOBS]: Job %s failed: %s", job_id, str(e))
+        update_job(job_id, status="failed", error=str(e))
+        telemetry.count_outcome("ingest", "failed")
+    finally:
+        _running.discard(job_id)
+        _job_writer.submit(_finish_job, job_id)
+        remove_upload(file_path)
+
+
+async def _process_batch_file(job_id: str, session_id: str, index: int, file: dict):
+    """
+    Chunk one file of a batch without storing it; returns (chunks, embeddings or None,
+    failed segment count).
+    """
+    update = functools.partial(update_file, job_id, index)
+    cached = ingest_cache.get(file["cache_key"], os.path.basename(file["path"])) if file["cache_key"] else None
+    if cached is not None:
+        update(status="indexing", progress=0.9, chunks=len(cached[0]), cache_hit=True)
+        return cached[0], cached[1], 0
+    update(status="processing", progress=0.1)
+    failed = 0
+    if file["segmenter"] is not None:
+        chunks, _, failed = await _run_segmented(job_id, session_id, file["path"], file["segmenter"],
+                                                 file["file_type"], file["source_index"], update=update, index=False)
+        if failed:
+            update(partial=True)
+    else:
+        with telemetry.timed("ingest", PROCESS_STAGES.get(file["file_type"], "process")):
+            chunks, _ = await run_in_pool(file["handler"], file["path"], session_id)
+    update(status="indexing", progress=0.9, chunks=len(chunks))
+    return chunks, None, failed
+
+
+async def run_batch_ingest_job(job_id: str, files: list):
+    """
+    Ingest several files into one session. Every file is partitioned or transcribed
+    concurrently in the process pool, then all new chunks are embedded in one call
+    and written in one bulk upsert. Each file keeps its own source slot, so chunk
+    ids and positions never collide.
+
+    files holds one dict per file, in the order of the job's "files" entries, with
+    "path", "file_type", "handler", "segmenter", "cache_key" and "source_index".
+    One failed file does not fail the batch unless every file fails. The temp
+    files are always removed.
+    """
+    session_id = jobs[job_id]["session_id"]
+    queued_at = time.perf_counter()
+    _running.add(job_id)
+    try:
+        async with _get_semaphore():
+            started = time.perf_counter()
+            telemetry.observe_stage("ingest", "queue_wait", started - queued_at)
+            if not is_valid_session(session_id):
+                update_job(job_id, status="failed", error="Session expired or deleted before indexing")
+                telemetry.count_outcome("ingest", "session_gone")
+                return
+            update_job(job_id, status="processing", progress=0.05)
+            app_logger.info("[JOBS]: Job %s processing %d files", job_id, len(files))
+            results = await asyncio.gather(*(_process_batch_file(job_id, session_id, i, file)
+                                             for i, file in enumerate(files)), return_exceptions=True)
+
+            sources, indexed, partial = [], [], False
+            for i, (file, result) in enumerate(zip(files, results)):
+                if isinstance(result, BaseException):
+                    app_logger.error("[JOBS]: Job %s file %s failed: %s", job_id, file["path"], str(result))
+                    update_file(job_id, i, status="failed", error=str(result))
+                    continue
+                indexed.append(i)
+                if result[2]:
+                    partial = True
+                if result[0]:
+                    sources.append((i, {"chunks": result[0], "embeddings": result[1],
+                                        "source_index": file["source_index"], "partial": result[2] > 0}))
+            if not indexed:
+                raise RuntimeError("All files failed")
+
+            update_job(job_id, status="indexing")
+            if sources:
+                embeddings = await asyncio.to_thread(add_sources_to_vector_store, session_id,
+                                                     [source for _, source in sources])
+                for (i, source), vectors in zip(sources, embeddings):
+                    if source["embeddings"] is None and not source["partial"] and files[i]["cache_key"]:
+                        ingest_cache.put(files[i]["cache_key"], source["chunks"], vectors)
+            for i in indexed:
+                update_file(job_id, i, status="done", progress=1.0)
+
+            chunk_count = sum(len(source["chunks"]) for _, source in sources)
+            partial = partial or len(indexed) < len(files)
+            update_job(job_id, status="done", progress=1.0, partial=partial)
+            telemetry.observe_stage("ingest", "total", time.perf_counter() - started)
+            telemetry.observe_chunks("ingest", chunk_count)
+            telemetry.count_outcome("ingest", "partial" if partial else "done")
+            app_logger.info("[JOBS]: Job %s done with %d chunks from %d/%d files",
+                            job_id, chunk_count, len(indexed), len(files))
+    except Exception as e:
+        app_logger.error("[JOBS]: Job %s failed: %s", job_id, str(e))
+        update_job(job_id, status="failed", error=str(e))
+        telemetry.count_outcome("ingest", "failed")
+    finally:
+        _running.discard(job_id)
+        _job_writer.submit(_finish_job, job_id)
+        for file in files:
+            remove_upload(file["path"])
@@ -0,0 +1,212 @@
+# lexical_index.py
+import heapq
+import json
+import math
+import os
+import re
+import threading
+import logging
+from collections import OrderedDict
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking, run a single worker
+    fcntl = None
+
+import config
+
+app_logger = logging.getLogger("DocumentAI")
+app_logger.setLevel(logging.INFO)
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+
+def tokenize(text: str) -> list:
+    """Lowercase, strip punctuation and split into whole-word tokens."""
+    return re.sub(r'[^\w\s]', '', text.lower()).split()
+
+
+class LexicalIndex:
+    """BM25 inverted index over the chunk positions of one session."""
+
+    def __init__(self):
+        self.postings = {}  # term -> {position: term frequency}
+        self.doc_len = {}  # position -> number of tokens
+        self.total_len = 0
+
+    def _remove(self, position: int):
+        self.total_len -= self.doc_len.pop(position)
+        for term in [t for t, plist in self.postings.items() if position in plist]:
+            del self.postings[term][position]
+            if not self.postings[term]:
+                del self.postings[term]
+
+    def add(self, position: int, text: str):
+        if position in self.doc_len:
+            self._remove(position)
+        tokens = tokenize(text)
+        self.doc_len[position] = len(tokens)
+        self.total_len += len(tokens)
+        for token in tokens:
+            plist = self.postings.setdefault(token, {})
+            plist[position] = plist.get(position, 0) + 1
+
+    def search(self, terms: list, k: int) -> list:
+        """Return up to k (position, score) pairs, best first."""
+        n_docs = len(self.doc_len)
+        if not n_docs:
+            return []
+        avg_len = self.total_len / n_docs or 1
+        scores = {}
+        for term in set(terms):
+            plist = self.postings.get(term)
+            if not plist:
+                continue
+            idf = math.log(1 + (n_docs - len(plist) + 0.5) / (len(plist) + 0.5))
+            for position, tf in plist.items():
+                norm = tf + BM25_K1 * (1 - BM25_B + BM25_B * self.doc_len[position] / avg_len)
+                scores[position] = scores.get(position, 0.0) + idf * tf * (BM25_K1 + 1) / norm
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+    def to_dict(self) -> dict:
+        return {"postings": self.postings, "doc_len": self.doc_len}
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        index = cls()
+        index.postings = {term: {int(pos): tf for pos, tf in plist.items()}
+                          for term, plist in data["postings"].items()}
+        index.doc_len = {int(pos): length for pos, length in data["doc_len"].items()}
+        index.total_len = sum(index.doc_len.values())
+        return index
+
+
+# session_id -> (index, (mtime_ns, size) of the file it was loaded from); LRU ordered
+_loaded = OrderedDict()
+_lock = threading.Lock()
+
+
+def _index_path(session_id: str) -> str:
+    return os.path.join(config.LEXICAL_INDEX_PATH, f"{session_id}.json")
+
+
+def _file_version(path: str):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _lock_path(session_id: str) -> str:
+    return os.path.join(config.LEXICAL_INDEX_PATH, f"{session_id}.lock")
+
+
+@contextmanager
+def _session_file_lock(session_id: str):
+    """
+    Exclusive lock on a session's index file across processes, held from load to
+    rewrite so concurrent uploads on different workers never drop each other's postings.
+
+    delete_lexical_index unlinks the lock file while holding it. A process that opened
+    the old file and was waiting would then hold a lock nobody else can see, so after
+    locking, the file is checked to still be the one at the path, and reopened if not.
+    """
+    if fcntl is None:
+        yield
+        return
+    os.makedirs(config.LEXICAL_INDEX_PATH, exist_ok=True)
+    path = _lock_path(session_id)
+    while True:
+        lock_file = open(path, "a")
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            current = os.stat(path)
+        except FileNotFoundError:
+            current = None
+        locked = os.fstat(lock_file.fileno())
+        if current is not None and (current.st_dev, current.st_ino) == (locked.st_dev, locked.st_ino):
+            break
+        lock_file.close()
+    try:
+        yield
+    finally:
+        fcntl.flock(lock_file, fcntl.LOCK_UN)
+        lock_file.close()
+
+
+def _load(session_id: str) -> LexicalIndex:
+    """Return the session's index, reloading it if another process rewrote the file."""
+    path = _index_path(session_id)
+    mtime = _file_version(path)
+    cached = _loaded.get(session_id)
+    if cached is not None and cached[1] == mtime:
+        _loaded.move_to_end(session_id)
+        return cached[0]
+    if mtime is None:
+        index = LexicalIndex()
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            index = LexicalIndex.from_dict(json.load(f))
+    _remember(session_id, index, mtime)
+    return index
+
+
+def _remember(session_id: str, index: LexicalIndex, mtime):
+    _loaded[session_id] = (index, mtime)
+    _loaded.move_to_end(session_id)
+    while len(_loaded) > config.LEXICAL_CACHE_SESSIONS:
+        _loaded.popitem(last=False)
+
+
+def add_to_lexical_index(session_id: str, documents: list, positions: list):
+    """Incrementally index documents for a session and persist the index to disk."""
+    with _lock, _session_file_lock(session_id):
+        index = _load(session_id)
+        for position, text in zip(positions, documents):
+            index.add(position, text)
+        os.makedirs(config.LEXICAL_INDEX_PATH, exist_ok=True)
+        path = _index_path(session_id)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(index.to_dict(), f)
+        os.replace(tmp_path, path)
+        _remember(session_id, index, _file_version(path))
+    app_logger.info("[LEXICAL INDEX]: Indexed %d chunks for session %s", len(documents), session_id)
+
+
+def search_lexical_index(session_id: str, terms: list, k: int) -> list:
+    """BM25 search over a session's chunks; returns [(position, score), ...]."""
+    with _lock:
+        return _load(session_id).search(terms, k)
+
+
+def delete_lexical_index(session_id: str):
+    """Drop a session's index from memory and disk; see _session_file_lock for the lock file."""
+    with _lock:
+        _loaded.pop(session_id, None)
+        with _session_file_lock(session_id):
+            for path in (_index_path(session_id), _lock_path(session_id)):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+
+def list_indexed_sessions() -> list:
+    """Return (session_id, last_modified) for every session with an index on disk."""
+    try:
+        names = os.listdir(config.LEXICAL_INDEX_PATH)
+    except FileNotFoundError:
+        return []
+    indexed = []
+    for name in names:
+        if name.endswith(".json"):
+            path = os.path.join(config.LEXICAL_INDEX_PATH, name)
+            try:
+                indexed.append((name[:-len(".json")], os.stat(path).st_mtime))
+            except FileNotFoundError:
+                continue
+    return indexed
@@ -1,10 +1,249 @@
 # llm.py
-from langchain_ollama import OllamaLLM 
+import asyncio
+import hashlib
+import math
+import threading
+import time
+import logging
+
 import config
 
-# Create an instance of the LangChain Ollama LLM.
-# Note: You can pass stream=False to disable streaming.
-ollama_llm = OllamaLLM(
-    model=config.OLLAMA_MODEL,
-    base_url="http://localhost:11434"
-)
\ No newline at end of file
+app_logger = logging.getLogger("DocumentAI")
+app_logger.setLevel(logging.INFO)
+
+_qa_chain = None
+_lock = threading.Lock()
+
+def get_qa_chain():
+    """
+    Build the prompt | Ollama chain on first use. LangChain is imported here rather
+    than at module import, which keeps server start-up fast.
+    """
+    global _qa_chain
+    with _lock:
+        if _qa_chain is None:
+            import httpx
+            from langchain_core.prompts import PromptTemplate
+            from langchain_ollama import OllamaLLM
+
+            # Create an instance of the LangChain Ollama LLM. Its HTTP client keeps up to
+            # LLM_MAX_CONCURRENT connections alive, one per generation slot of the dispatcher.
+            ollama_llm = OllamaLLM(
+                model=config.OLLAMA_MODEL,
+                base_url=config.OLLAMA_BASE_URL,
+                client_kwargs={"limits": httpx.Limits(max_connections=config.LLM_MAX_CONCURRENT,
+                                                      max_keepalive_connections=config.LLM_MAX_CONCURRENT,
+                                                      keepalive_expiry=config.LLM_KEEPALIVE_SECONDS)},
+            )
+            prompt = PromptTemplate(
+                input_variables=["context", "question"],
+                template="Use the following context to answer the question.\n\n{context}\n\nQ: {question}\nA:"
+            )
+            _qa_chain = prompt | ollama_llm
+    return _qa_chain
+
+def check_ollama():
+    """Raise unless the Ollama server answers and has the configured model pulled."""
+    import httpx
+    response = httpx.get(f"{config.OLLAMA_BASE_URL}/api/tags", timeout=5)
+    response.raise_for_status()
+    models = {m.get("name", "").split(":")[0] for m in response.json().get("models", [])}
+    if config.OLLAMA_MODEL.split(":")[0] not in models:
+        raise RuntimeError(f"Ollama model {config.OLLAMA_MODEL} is not pulled")
+
+
+class LLMBusyError(Exception):
+    """Raised when every generation slot is taken and the wait queue is full."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"LLM is at capacity, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class _Generation:
+    """One generation shared by every request that asked for the same prompt."""
+
+    def __init__(self):
+        self.tokens = []
+        self.done = False
+        self.error = None
+        self.subscribers = 0
+        self.queued = True
+        self.task = None
+        self.updated = asyncio.Event()
+
+    def _notify(self):
+        # Swap in a fresh event so followers waiting on the old one wake up exactly once.
+        updated, self.updated = self.updated, asyncio.Event()
+        updated.set()
+
+    def append(self, token: str):
+        self.tokens.append(token)
+        self._notify()
+
+    def finish(self, error: BaseException = None):
+        self.done = True
+        self.error = error
+        self._notify()
+
+
+class _Follower:
+    """Async iterator over a shared generation's tokens, replaying the ones already produced."""
+
+    def __init__(self, generation: _Generation):
+        self.generation = generation
+        self.index = 0
+        self.closed = False
+        generation.subscribers += 1
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        generation = self.generation
+        while not self.closed:
+            updated = generation.updated
+            if self.index < len(generation.tokens):
+                self.index += 1
+                return generation.tokens[self.index - 1]
+            if generation.done:
+                await self.aclose()
+                if isinstance(generation.error, asyncio.CancelledError):
+                    raise RuntimeError("Generation was cancelled")
+                if generation.error is not None:
+                    raise generation.error
+                break
+            await updated.wait()
+        raise StopAsyncIteration
+
+    async def aclose(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.generation.subscribers -= 1
+        if self.generation.subscribers == 0 and not self.generation.done:
+            self.generation.task.cancel()
+
+
+class LLMDispatcher:
+    """
+    Bounded front door to the QA chain, used from the event loop.
+
+    At most max_concurrent generations run at once and up to max_queue more wait
+    for a slot. Past that, requests fail fast with LLMBusyError, which carries a
+    Retry-After estimate, instead of piling up inside Ollama. Requests with the
+    same coalescing key (session, context and question) while a generation is in
+    flight follow that generation instead of starting their own. A generation is
+    cancelled once its last follower goes away.
+    """
+
+    def __init__(self, max_concurrent: int, max_queue: int, retry_after: float):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self._semaphore = None
+        self._inflight = {}  # coalescing key -> _Generation
+        self._active = 0
+        self._waiting = 0
+        self._average_seconds = retry_after
+        self.generated = 0
+        self.coalesced = 0
+        self.rejected = 0
+
+    @staticmethod
+    def coalescing_key(session_id: str, context: str, question: str) -> str:
+        return hashlib.sha256("\x00".join((session_id, context, question)).encode()).hexdigest()
+
+    def _get_semaphore(self):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        return self._semaphore
+
+    def _retry_after(self) -> int:
+        # Time for the queue ahead to drain at the observed generation time.
+        return max(1, math.ceil(self._average_seconds * (self._waiting + 1) / self.max_concurrent))
+
+    def _start(self, key: str, inputs: dict) -> _Generation:
+        generation = self._inflight.get(key)
+        if generation is not None and not generation.done:
+            self.coalesced += 1
+            return generation
+        if self._active + self._waiting >= self.max_concurrent + self.max_queue:
+            self.rejected += 1
+            raise LLMBusyError(self._retry_after())
+        generation = _Generation()
+        self._inflight[key] = generation
+        self._waiting += 1
+        generation.task = asyncio.create_task(self._generate(generation, inputs))
+        generation.task.add_done_callback(lambda task: self._finished(key, generation, task))
+        return generation
+
+    async def _generate(self, generation: _Generation, inputs: dict):
+        """Run one generation and return the error it ended with, if any."""
+        try:
+            try:
+                await self._get_semaphore().acquire()
+            finally:
+                generation.queued = False
+                self._waiting -= 1
+            self._active += 1
+            started = time.perf_counter()
+            try:
+                stream = get_qa_chain().astream(inputs)
+                try:
+                    async for token in stream:
+                        generation.append(token)
+                finally:
+                    # Closing the chain stream closes the Ollama HTTP stream, which stops generation.
+                    await stream.aclose()
+                self.generated += 1
+                self._average_seconds = 0.8 * self._average_seconds + 0.2 * (time.perf_counter() - started)
+            finally:
+                self._active -= 1
+                self._get_semaphore().release()
+        except asyncio.CancelledError as e:
+            return e
+        except Exception as e:
+            app_logger.error("[LLM]: Generation failed: %s", str(e))
+            return e
+        return None
+
+    def _finished(self, key: str, generation: _Generation, task: asyncio.Task):
+        if generation.queued:
+            # Cancelled before the task ever ran, so _generate did no bookkeeping.
+            generation.queued = False
+            self._waiting -= 1
+        if self._inflight.get(key) is generation:
+            del self._inflight[key]
+        generation.finish(asyncio.CancelledError() if task.cancelled() else task.result())
+
+    def stream(self, key: str, inputs: dict):
+        """
+        Admit a request and return an async iterator over its answer tokens.
+        Raises LLMBusyError right away, before any token is sent, when full.
+        Call aclose() on the iterator to give up on the answer.
+        """
+        return _Follower(self._start(key, inputs))
+
+    async def invoke(self, key: str, inputs: dict) -> str:
+        """Admit a request and return the whole answer."""
+        tokens = self.stream(key, inputs)
+        try:
+            return "".join([token async for token in tokens])
+        finally:
+            await tokens.aclose()
+
+    def stats(self) -> dict:
+        return {
+            "active": self._active,
+            "queued": self._waiting,
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "generated": self.generated,
+            "coalesced": self.coalesced,
+            "rejected": self.rejected,
+            "average_seconds": self._average_seconds,
+        }
+
+
+llm_dispatcher = LLMDispatcher(config.LLM_MAX_CONCURRENT, config.LLM_MAX_QUEUE,
+                               retry_after=config.LLM_RETRY_AFTER_SECONDS)
@@ -1,10 +1,14 @@
 # main.py
-from fastapi import FastAPI, File, UploadFile, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, File, Form, UploadFile, HTTPException, BackgroundTasks, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-import os
+import asyncio
+import functools
+import json
+import time
 import logging
+from typing import List
 
 # Silence root logger and disable propagation
 # logging.getLogger().setLevel(logging.CRITICAL)  # Root logger only logs CRITICAL
@@ -27,17 +31,30 @@ app_logger.addHandler(handler)
 app_logger.propagate = False  # Prevent logs from going to root
 
 
-from processing import get_file_type
-from session import create_session, is_valid_session
-# Instead of the old ask_ollama, use the new LLM instance from llm.py
-from llm import ollama_llm
-from vector_store import add_chunks_to_vector_store, get_vectorstore, query_chunks
+_imports_started = time.perf_counter()
+import config
+import readiness
+import telemetry
+from chunking import count_tokens
+from processing import get_file_type, save_upload, remove_upload, UploadTooLargeError
+from session import (create_session, is_valid_session, delete_session, expire_sessions,
+                     record_reclaimed_vectors, session_stats, session_exists, allocate_sources,
+                     prune_pending_jobs, prune_jobs, session_version, orphaned_sessions, record_stored_sessions,
+                     claim_maintenance, release_maintenance)
+from ingest_cache import ingest_cache
+from ocr_cache import get_ocr_cache
+from jobs import (create_job, get_job, run_ingest_job, run_batch_ingest_job, session_has_pending_jobs,
+                  shutdown_executor, warm_up_workers, heartbeat_jobs)
+# Instead of the old ask_ollama, use the new LLM chain from llm.py
+from llm import get_qa_chain, check_ollama, llm_dispatcher, LLMBusyError
+from embedding import embedding_service
+from vector_store import (query_chunks, embed_query, remove_stop_words, purge_session_data, get_client,
+                          list_stored_sessions)
+from lexical_index import tokenize, list_indexed_sessions
+from answer_cache import answer_cache, question_anchors
 # Assuming you have agent modules for different file types
 from agents import document_agent, image_agent, audio_agent
-
-from langchain.prompts import PromptTemplate
-
-import logging
+readiness.record_stage("imports: app modules", time.perf_counter() - _imports_started)
 
 logging.basicConfig(
     level=logging.INFO,
@@ -49,13 +66,49 @@ class AskRequest(BaseModel):
     session_id: str
     question: str
 
-prompt = PromptTemplate(
-    input_variables=["context", "question"],
-    template="Use the following context to answer the question.\n\n{context}\n\nQ: {question}\nA:"
-)
+app = FastAPI()
 
+class UploadSizeLimitMiddleware:
+    """
+    Enforce MAX_UPLOAD_BYTES on /upload requests as the body arrives. Starlette's
+    multipart parser spools the whole body before the endpoint runs, so a check in
+    save_upload alone would come after a chunked (or lying) request had been fully
+    received. A declared Content-Length over the limit is rejected before any of the
+    body is read; otherwise the body is counted and the request fails with 413 as
+    soon as it passes the limit.
+    """
 
-app = FastAPI()
+    def __init__(self, app, max_bytes: int):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith("/upload"):
+            return await self.app(scope, receive, send)
+        headers = dict(scope["headers"])
+        content_length = headers.get(b"content-length", b"")
+        if content_length.isdigit() and int(content_length) > self.max_bytes:
+            telemetry.count_outcome("upload", "too_large")
+            response = JSONResponse({"detail": "Upload too large."}, status_code=413)
+            return await response(scope, receive, send)
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    # Raised while FastAPI reads the form, which lets HTTPException through as a 413.
+                    telemetry.count_outcome("upload", "too_large")
+                    raise HTTPException(status_code=413, detail="Upload too large.")
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+# Added before CORSMiddleware, which wraps it, so 413 responses carry the CORS headers too.
+app.add_middleware(UploadSizeLimitMiddleware, max_bytes=config.MAX_UPLOAD_BYTES)
 
 app.add_middleware(
     CORSMiddleware,
@@ -69,76 +122,437 @@ app.add_middleware(
 async def healthcare():
     return {"message": "success"}
 
+@app.get("/ready")
+async def ready():
+    """Readiness: 200 once every required component has loaded, 503 until then."""
+    return JSONResponse(readiness.report(), status_code=200 if readiness.is_ready() else 503)
+
+WARM_UP_STEPS = [
+    ("vector_store", get_client),
+    ("embedding_model", lambda: embedding_service.embed(["warm-up"])),
+    ("llm_chain", get_qa_chain),
+    ("ollama", check_ollama),
+    ("ingest_workers", warm_up_workers),
+]
+async def warm_up():
+    """
+    Load the heavy components one after another without blocking the event loop,
+    then keep retrying the ones that failed, with exponential backoff, until all
+    are ready: Ollama, for one, often comes up after the API.
+    """
+    failed = []
+    for name, step in WARM_UP_STEPS:
+        if not await asyncio.to_thread(readiness.run_component, name, step):
+            failed.append((name, step))
+    app_logger.info("[READINESS]: Startup stages: %s",
+                    ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in readiness.startup_stages))
+    delay = config.WARM_UP_RETRY_SECONDS
+    while failed:
+        await asyncio.sleep(delay)
+        app_logger.info("[READINESS]: Retrying %s", ", ".join(name for name, _ in failed))
+        failed = [(name, step) for name, step in failed
+                  if not await asyncio.to_thread(readiness.run_component, name, step)]
+        delay = min(delay * 2, config.WARM_UP_RETRY_MAX_SECONDS)
+
+AGENT_HANDLERS = {
+    "document": document_agent.handle_document,
+    "image": image_agent.handle_image,
+    "audio": audio_agent.handle_audio,
+}
+
+def get_segmenter(file_type: str, file_path: str, strategy: str = None):
+    """
+    Segmenter for files whose work is split and processed in parallel (see
+    jobs._run_segmented), or None to run the agent handler on the whole file.
+    """
+    if file_type == "audio":
+        return (audio_agent.plan_segments, audio_agent.transcribe_segment)
+    if file_type == "document" and file_path.lower().endswith(".pdf"):
+        return (functools.partial(document_agent.plan_pdf_pages, strategy=strategy),
+                document_agent.partition_pages, document_agent.merge_pages)
+    if file_type == "image":
+        return (image_agent.plan_frames, image_agent.ocr_frame, image_agent.merge_frames)
+    return None
+
+def backfill_stored_sessions():
+    """
+    Record the sessions already in the vector store before the session store tracked
+    them. A full scan of the vector store, so one worker runs it, once per session store.
+    """
+    if not claim_maintenance("backfill_stored_sessions"):
+        return
+    try:
+        stored = list_stored_sessions()
+    except BaseException:
+        release_maintenance("backfill_stored_sessions")
+        raise
+    record_stored_sessions(stored)
+    app_logger.info("[SESSIONS]: Recorded %d sessions found in the vector store", len(stored))
+
+def compact_sessions():
+    """
+    Purge the data of expired sessions, and of sessions that no longer exist but
+    still have vectors (recorded in the session store when their chunks were added)
+    or a lexical index file not written for a full session timeout, e.g. from before
+    a restart or a purge that failed.
+    """
+    expired = set(expire_sessions())
+    prune_pending_jobs()
+    prune_jobs()
+    backfill_stored_sessions()
+    cutoff = time.time() - config.SESSION_TIMEOUT_SECONDS
+    orphans = {session_id for session_id, modified in list_indexed_sessions()
+               if modified < cutoff and not session_exists(session_id)}
+    orphans.update(orphaned_sessions())
+    orphans -= expired
+    if orphans:
+        app_logger.info("[SESSIONS]: Found %d orphaned sessions", len(orphans))
+    reclaimed = 0
+    for reason, session_ids in (("expired", expired), ("orphaned", orphans)):
+        for session_id in session_ids:
+            vectors = purge_session_data(session_id)
+            telemetry.count_reclaimed(reason, vectors)
+            reclaimed += vectors
+    record_reclaimed_vectors(reclaimed)
+    if expired or orphans:
+        app_logger.info("[SESSIONS]: Compaction purged %d sessions, %d vectors", len(expired | orphans), reclaimed)
+
+async def compact_sessions_periodically():
+    while True:
+        await asyncio.sleep(config.SESSION_COMPACTION_INTERVAL_SECONDS)
+        try:
+            await asyncio.to_thread(compact_sessions)
+        except Exception as e:
+            app_logger.error("[SESSIONS]: Compaction failed: %s", str(e))
+
+async def heartbeat_jobs_periodically():
+    while True:
+        await asyncio.sleep(config.JOB_HEARTBEAT_SECONDS)
+        try:
+            await asyncio.to_thread(heartbeat_jobs)
+        except Exception as e:
+            app_logger.error("[JOBS]: Heartbeat failed: %s", str(e))
+
+background_tasks_running = set()
+
+@app.on_event("startup")
+async def start_background_tasks():
+    background_tasks_running.add(asyncio.create_task(compact_sessions_periodically()))
+    background_tasks_running.add(asyncio.create_task(heartbeat_jobs_periodically()))
+    if config.WARM_UP_ON_STARTUP:
+        # Without warm-up nothing is registered and components load lazily on first use.
+        for name, _ in WARM_UP_STEPS:
+            readiness.register(name)
+        background_tasks_running.add(asyncio.create_task(warm_up()))
+
+@app.on_event("shutdown")
+def shutdown_ingest_workers():
+    for task in background_tasks_running:
+        task.cancel()
+    shutdown_executor()
+
+def resolve_upload_session(session_id: str, files: int):
+    """
+    Return (session_id, first source index) for an upload of files files: a new
+    session, or the given one if it is still valid, with a source slot per file.
+    """
+    if session_id is None:
+        session_id = create_session()
+    elif not is_valid_session(session_id):
+        raise HTTPException(status_code=404, detail="Session not found or expired.")
+    first_source = allocate_sources(session_id, files)
+    if first_source is None:
+        raise HTTPException(status_code=404, detail="Session not found or expired.")
+    return session_id, first_source
+
+def check_strategy(strategy: str):
+    if strategy is not None and strategy not in document_agent.PDF_STRATEGIES:
+        raise HTTPException(status_code=400,
+                            detail=f"strategy must be one of {', '.join(document_agent.PDF_STRATEGIES)}.")
+
+def ingest_cache_key(file_hash: str, strategy: str) -> str:
+    # A forced PDF strategy yields different chunks, so it gets its own ingest cache entry.
+    return f"{file_hash}:{strategy}" if strategy not in (None, "auto") else file_hash
+
+async def save_typed_upload(file: UploadFile):
+    """Stream an upload to disk and detect its type; returns (path, sha256, size, file_type)."""
+    try:
+        with telemetry.timed("upload", "save"):
+            temp_path, file_hash, file_size = await save_upload(file)
+    except UploadTooLargeError:
+        telemetry.count_outcome("upload", "too_large")
+        raise HTTPException(status_code=413, detail="Upload too large.")
+    with telemetry.timed("upload", "detect_type"):
+        file_type = get_file_type(temp_path)
+    if file_type not in AGENT_HANDLERS:
+        remove_upload(temp_path)
+        telemetry.count_outcome("upload", "unsupported")
+        raise HTTPException(status_code=400, detail=f"Unsupported file type: {file.filename}")
+    app_logger.info("[UPLOAD]: Saved %s (%d bytes, sha256 %s)", file.filename, file_size, file_hash)
+    return temp_path, file_hash, file_size, file_type
+
 @app.post("/upload")
-async def upload_file(file: UploadFile = File(...)):
-    # Save file temporarily
-    temp_dir = "temp"
-    os.makedirs(temp_dir, exist_ok=True)
-    temp_path = os.path.join(temp_dir, file.filename)
-    contents = await file.read()
-    with open(temp_path, "wb") as f:
-        f.write(contents)
-
-    # Create a new session
-    session_id = create_session()
-
-    # Determine file type using the processing utility
-    file_type = get_file_type(temp_path)
-    if file_type == "document":
-        # Process file to extract chunks and index into vector store.
-        chunks, session_id = document_agent.handle_document(temp_path, session_id)
-        # Now add the chunks to the LangChain vector store.
-        add_chunks_to_vector_store(session_id, chunks)
-    elif file_type == "image":
-        chunks, session_id = image_agent.handle_image(temp_path, session_id)
-        add_chunks_to_vector_store(session_id, chunks)
-        
-    elif file_type == "audio":
-        chunks, session_id = audio_agent.handle_audio(temp_path, session_id)
-        add_chunks_to_vector_store(session_id, chunks)
-    else:
-        os.remove(temp_path)
-        raise HTTPException(status_code=400, detail="Unsupported file type.")
-
-    os.remove(temp_path)
-    return {"session_id": session_id}
-
-# Instantiate the vector store once.
-vectorstore = get_vectorstore()
-retriever = vectorstore.as_retriever(search_kwargs={"k": 10})
-prompt = PromptTemplate(
-    input_variables=["context", "question"],
-    template="Use the following context to answer the question.\n\n{context}\n\nQ: {question}\nA:"
-)
+async def upload_file(background_tasks: BackgroundTasks, file: UploadFile = File(...),
+                      strategy: str = Form(None), session_id: str = Form(None)):
+    check_strategy(strategy)
 
+    # Stream the upload to a unique temp path and determine its file type
+    temp_path, file_hash, _, file_type = await save_typed_upload(file)
+    try:
+        # Create a new session (or add to the given one) and hand the heavy lifting to the ingestion workers
+        session_id, source_index = await asyncio.to_thread(resolve_upload_session, session_id, 1)
+        job_id = await asyncio.to_thread(create_job, session_id, file.filename, file_type,
+                                         ingest_cache_key(file_hash, strategy))
+    except BaseException:
+        remove_upload(temp_path)
+        raise
+    background_tasks.add_task(run_ingest_job, job_id, AGENT_HANDLERS[file_type], temp_path,
+                              get_segmenter(file_type, temp_path, strategy), source_index)
+    telemetry.count_outcome("upload", "accepted")
+    return {"session_id": session_id, "job_id": job_id}
 
+@app.post("/upload/batch")
+async def upload_batch(background_tasks: BackgroundTasks, files: List[UploadFile] = File(...),
+                       strategy: str = Form(None), session_id: str = Form(None)):
+    """Upload several files into one session (new, or session_id) as a single ingestion job."""
+    check_strategy(strategy)
+    if len(files) > config.UPLOAD_MAX_FILES:
+        raise HTTPException(status_code=400, detail=f"At most {config.UPLOAD_MAX_FILES} files per batch.")
 
-# qa_chain = LLMChain(llm=ollama_llm, prompt=prompt)
+    saved = []
+    try:
+        for file in files:
+            saved.append((file.filename, *await save_typed_upload(file)))
+        session_id, first_source = await asyncio.to_thread(resolve_upload_session, session_id, len(saved))
+        job_id = await asyncio.to_thread(create_job, session_id, ", ".join(name for name, *_ in saved), "batch",
+                                         files=[(name, file_type) for name, _, _, _, file_type in saved])
+    except BaseException:
+        for _, temp_path, *_ in saved:
+            remove_upload(temp_path)
+        raise
+    batch = [{"path": temp_path, "file_type": file_type, "handler": AGENT_HANDLERS[file_type],
+              "segmenter": get_segmenter(file_type, temp_path, strategy),
+              "cache_key": ingest_cache_key(file_hash, strategy), "source_index": first_source + i}
+             for i, (_, temp_path, file_hash, _, file_type) in enumerate(saved)]
+    background_tasks.add_task(run_batch_ingest_job, job_id, batch)
+    telemetry.count_outcome("upload", "accepted")
+    return {"session_id": session_id, "job_id": job_id, "files": [name for name, *_ in saved]}
 
-qa_chain = prompt | ollama_llm
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    job = await asyncio.to_thread(get_job, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return job
 
-@app.post("/ask")
-async def ask_question(request: AskRequest):
-    session_id = request.session_id
-    question = request.question
+@app.delete("/sessions/{session_id}")
+async def remove_session(session_id: str):
+    if not delete_session(session_id):
+        raise HTTPException(status_code=404, detail="Session not found.")
+    reclaimed = await asyncio.to_thread(purge_session_data, session_id)
+    record_reclaimed_vectors(reclaimed)
+    telemetry.count_reclaimed("deleted", reclaimed)
+    return {"session_id": session_id, "deleted_vectors": reclaimed}
+
+@app.get("/stats")
+async def stats():
+    return {
+        "sessions": session_stats(),
+        "ingest_cache": ingest_cache.stats(),
+        "ocr_cache": get_ocr_cache().stats(),
+        "answer_cache": answer_cache.stats(),
+        "llm": llm_dispatcher.stats(),
+    }
+
+@app.get("/metrics")
+async def metrics():
+    """Stage latency histograms, chunk/token counts and cache gauges in the Prometheus text format."""
+    sessions, ingest, answers, llm = session_stats(), ingest_cache.stats(), answer_cache.stats(), llm_dispatcher.stats()
+    ocr = get_ocr_cache().stats()
+    gauges = {
+        "documentai_sessions_live": ("Sessions that have not expired.", sessions["live"]),
+        "documentai_ingest_cache_entries": ("Files held in the ingest cache.", ingest["entries"]),
+        "documentai_ingest_cache_hit_ratio": ("Ingest cache hits per lookup.", ingest["hit_rate"]),
+        "documentai_ocr_cache_entries": ("Image pages held in the OCR cache.", ocr["entries"]),
+        "documentai_ocr_cache_hit_ratio": ("OCR cache hits per page looked up.", ocr["hit_rate"]),
+        "documentai_ocr_pages": ("Image pages OCR'd, across all workers.", ocr["ocr_pages"]),
+        "documentai_ocr_seconds": ("Seconds spent in OCR, across all workers.", ocr["ocr_seconds"]),
+        "documentai_answer_cache_entries": ("Answers held in the answer cache.", answers["entries"]),
+        "documentai_answer_cache_hit_ratio": ("Answer cache hits per lookup.", answers["hit_rate"]),
+        "documentai_ready": ("1 once every required component has loaded.", int(readiness.is_ready())),
+        "documentai_llm_active": ("Generations running in Ollama.", llm["active"]),
+        "documentai_llm_queued": ("Requests waiting for a generation slot.", llm["queued"]),
+    }
+    return PlainTextResponse(telemetry.render(gauges), media_type="text/plain; version=0.0.4")
+
+def format_timestamp(seconds: float) -> str:
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
 
+def format_chunk(chunk: dict) -> str:
+    """Chunk text for the prompt; audio chunks are prefixed with their time span so answers can cite it."""
+    if chunk.get("start_time") is not None:
+        return f"[{format_timestamp(chunk['start_time'])}-{format_timestamp(chunk['end_time'])}] {chunk['chunk']}"
+    return chunk["chunk"]
+
+def session_state(session_id: str):
+    """(valid, has pending jobs, version) of a session: reads from the session store, so run it in a thread."""
     if not is_valid_session(session_id):
-        return JSONResponse({"error": "Invalid or expired session"}, status_code=400)
-    
-    try:
-        # Retrieve the relevant chunks and build the context string:
-        top_chunks = query_chunks(session_id=session_id, query=question)
-        context = "\n\n".join([chunk["chunk"] for chunk in top_chunks if "chunk" in chunk])
+        return False, False, 0
+    return True, session_has_pending_jobs(session_id), session_version(session_id)
+
+def question_cache_key(question: str) -> str:
+    return " ".join(tokenize(" ".join(remove_stop_words(question))))
+
+async def prepare_answer(session_id: str, question: str) -> dict:
+    """
+    Run the session checks, answer-cache lookup and retrieval shared by /ask and /ask/stream.
+
+    Returns a dict with "response" when /ask should answer early, "cached_answer" on a
+    cache hit, or else "context" plus the cache "key", "embedding", "version" and
+    "anchors" to store the generated answer under.
+    """
+    with telemetry.timed("ask", "session_check"):
+        valid, pending, version = await asyncio.to_thread(session_state, session_id)
+    if not valid:
+        telemetry.count_outcome("ask", "invalid_session")
+        return {"response": JSONResponse({"error": "Invalid or expired session"}, status_code=400)}
+
+    if pending:
+        telemetry.count_outcome("ask", "indexing")
+        return {"response": JSONResponse({"answer": "Still indexing the uploaded file, please try again shortly.",
+                                          "status": "indexing"}, status_code=202)}
+
+    key, anchors = question_cache_key(question), question_anchors(question)
+    with telemetry.timed("ask", "answer_cache"):
+        cached_answer = answer_cache.get(session_id, key, version=version, anchors=anchors)
+    embedding = None
+    if cached_answer is None and key and config.ANSWER_CACHE_SEMANTIC:
+        with telemetry.timed("ask", "query_embedding"):
+            embedding = await asyncio.to_thread(embed_query, question)
+        with telemetry.timed("ask", "answer_cache"):
+            cached_answer = answer_cache.get(session_id, key, embedding, version, anchors)
+    if cached_answer is not None:
+        telemetry.count_outcome("ask", "cached")
+        return {"cached_answer": cached_answer}
 
-        if not context:
-            return JSONResponse({"answer": "No relevant context found."})
+    # Retrieve the relevant chunks and build the context string:
+    # Run in a thread so concurrent /ask query embeddings can share a batch.
+    with telemetry.timed("ask", "retrieval"):
+        top_chunks = await asyncio.to_thread(query_chunks, session_id=session_id, query=question,
+                                             query_embedding=embedding)
+    context = "\n\n".join([format_chunk(chunk) for chunk in top_chunks if "chunk" in chunk])
+    telemetry.observe_chunks("ask", len(top_chunks))
+
+    if not context:
+        telemetry.count_outcome("ask", "no_context")
+        return {"response": JSONResponse({"answer": "No relevant context found."})}
+    telemetry.observe_tokens("context", count_tokens(context))
+    return {"context": context, "key": key, "embedding": embedding, "version": version,
+            "anchors": anchors, "llm_key": llm_dispatcher.coalescing_key(session_id, context, question)}
+
+def llm_busy_response(error: LLMBusyError) -> JSONResponse:
+    telemetry.count_outcome("llm", "rejected")
+    return JSONResponse({"error": "The model is busy, please retry shortly.", "retry_after": error.retry_after},
+                        status_code=429, headers={"Retry-After": str(error.retry_after)})
+
+@app.post("/ask")
+async def ask_question(request: AskRequest):
+    started = time.perf_counter()
+    try:
+        prepared = await prepare_answer(request.session_id, request.question)
+        if "response" in prepared:
+            return prepared["response"]
+        if "cached_answer" in prepared:
+            telemetry.observe_stage("ask", "total", time.perf_counter() - started)
+            return {"answer": prepared["cached_answer"], "cached": True}
         
-        # Now call the QA chain with a dictionary containing both keys.
-        answer = await qa_chain.ainvoke({"context": context, "question": question})
+        # Now call the QA chain with a dictionary containing both keys; identical
+        # in-flight prompts share one generation.
+        with telemetry.timed("ask", "llm"):
+            answer = await llm_dispatcher.invoke(prepared["llm_key"],
+                                                 {"context": prepared["context"], "question": request.question})
+        answer_cache.put(request.session_id, prepared["key"], answer,
+                         embedding=prepared["embedding"], version=prepared["version"],
+                         anchors=prepared["anchors"])
+        telemetry.observe_tokens("answer", count_tokens(answer))
+        telemetry.observe_stage("ask", "total", time.perf_counter() - started)
+        telemetry.count_outcome("ask", "answered")
         return {"answer": answer}
+    except LLMBusyError as e:
+        return llm_busy_response(e)
     except Exception as e:
+        telemetry.count_outcome("ask", "error")
         raise HTTPException(status_code=500, detail=str(e))
 
+def sse_event(data: dict, event: str = None) -> str:
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+@app.post("/ask/stream")
+async def ask_question_stream(request: AskRequest, http_request: Request):
+    """Stream the answer as Server-Sent Events: token events, then a done event with timings."""
+    started = time.perf_counter()
+    try:
+        prepared = await prepare_answer(request.session_id, request.question)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if "response" in prepared:
+        return prepared["response"]
+
+    async def cached_stream():
+        yield sse_event({"token": prepared["cached_answer"]})
+        telemetry.observe_stage("ask_stream", "total", time.perf_counter() - started)
+        total_ms = (time.perf_counter() - started) * 1000
+        yield sse_event({"ttft_ms": total_ms, "total_ms": total_ms, "tokens": 1, "cached": True}, event="done")
+
+    async def event_stream(stream):
+        first_token_at = None
+        tokens = []
+        try:
+            async for token in stream:
+                if await http_request.is_disconnected():
+                    app_logger.info("[ASK STREAM]: Client disconnected, cancelling generation")
+                    telemetry.count_outcome("ask_stream", "disconnected")
+                    return
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                    telemetry.observe_stage("ask_stream", "first_token", first_token_at - started)
+                tokens.append(token)
+                yield sse_event({"token": token})
+            total_ms = (time.perf_counter() - started) * 1000
+            ttft_ms = (first_token_at - started) * 1000 if first_token_at else None
+            app_logger.info("[ASK STREAM]: TTFT %s ms, total %.0f ms, %d tokens",
+                            f"{ttft_ms:.0f}" if ttft_ms is not None else "n/a", total_ms, len(tokens))
+            answer_cache.put(request.session_id, prepared["key"], "".join(tokens),
+                             embedding=prepared["embedding"], version=prepared["version"],
+                             anchors=prepared["anchors"])
+            telemetry.observe_stage("ask_stream", "total", total_ms / 1000)
+            telemetry.observe_tokens("answer", len(tokens))
+            telemetry.count_outcome("ask_stream", "answered")
+            yield sse_event({"ttft_ms": ttft_ms, "total_ms": total_ms, "tokens": len(tokens)}, event="done")
+        except Exception as e:
+            app_logger.error("[ASK STREAM]: Generation failed: %s", str(e))
+            telemetry.count_outcome("ask_stream", "error")
+            yield sse_event({"error": str(e)}, event="error")
+        finally:
+            # Leaving the shared generation cancels it once no other request follows it.
+            await stream.aclose()
+
+    if "cached_answer" in prepared:
+        stream = cached_stream()
+    else:
+        # Admitted before the response starts, so a full queue is still a plain 429.
+        try:
+            tokens = llm_dispatcher.stream(prepared["llm_key"],
+                                           {"context": prepared["context"], "question": request.question})
+        except LLMBusyError as e:
+            return llm_busy_response(e)
+        stream = event_stream(tokens)
+    return StreamingResponse(stream, media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
@@ -0,0 +1,76 @@
+# migrate_vector_store.py
+"""
+Copy chunks from the global "document_chunks" collection into the per-session
+or bucketed collections used by VECTOR_STORE_LAYOUT = "session" / "bucket".
+
+Usage (stop the server first):
+    python migrate_vector_store.py --layout session [--page-size 1000] [--delete-source]
+
+Stored embeddings are copied as they are, so nothing is re-embedded. Upserts make
+the migration safe to re-run if it is interrupted. After it finishes, set
+VECTOR_STORE_LAYOUT in config.py to the same layout.
+"""
+import argparse
+import sys
+import time
+
+import vector_store
+
+
+def migrate(layout: str, page_size: int, delete_source: bool) -> int:
+    source = vector_store.get_global_collection()
+    total = source.count()
+    print(f"Migrating {total} vectors from 'document_chunks' to the '{layout}' layout")
+
+    started = time.perf_counter()
+    copied = 0
+    sessions = set()
+    offset = 0
+    while offset < total:
+        page = source.get(limit=page_size, offset=offset, include=["documents", "metadatas", "embeddings"])
+        if not page["ids"]:
+            break
+        offset += len(page["ids"])
+
+        # Group the page by target collection so each gets one upsert.
+        groups = {}
+        for i, metadata in enumerate(page["metadatas"]):
+            session_id = metadata.get("session_id")
+            if not session_id:
+                continue
+            sessions.add(session_id)
+            name = vector_store.collection_name(session_id, layout)
+            group = groups.setdefault(name, {"session_id": session_id, "ids": [], "documents": [],
+                                             "metadatas": [], "embeddings": []})
+            group["ids"].append(page["ids"][i])
+            group["documents"].append(page["documents"][i])
+            group["metadatas"].append(metadata)
+            group["embeddings"].append(page["embeddings"][i])
+
+        for group in groups.values():
+            target = vector_store.get_collection(group["session_id"], layout=layout)
+            target.upsert(ids=group["ids"], documents=group["documents"],
+                          metadatas=group["metadatas"], embeddings=group["embeddings"])
+            copied += len(group["ids"])
+        print(f"  {offset}/{total} read, {copied} copied")
+
+    if delete_source and copied:
+        vector_store.get_client().delete_collection("document_chunks")
+        print("Deleted the source collection 'document_chunks'")
+
+    print(f"Copied {copied} vectors for {len(sessions)} sessions in {time.perf_counter() - started:.1f}s")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--layout", choices=["session", "bucket"], required=True)
+    parser.add_argument("--page-size", type=int, default=1000)
+    parser.add_argument("--delete-source", action="store_true",
+                        help="drop 'document_chunks' once everything has been copied")
+    args = parser.parse_args()
+    return migrate(args.layout, args.page_size, args.delete_source)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
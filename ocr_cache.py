@@ -0,0 +1,111 @@
+# ocr_cache.py
+import json
+import threading
+import time
+import logging
+
+import config
+from sqlite_db import SQLiteDatabase
+
+app_logger = logging.getLogger("DocumentAI")
+app_logger.setLevel(logging.INFO)
+
+_COUNTERS = ("hits", "misses", "mismatches", "evictions", "ocr_pages", "ocr_seconds")
+
+
+class OCRCache:
+    """
+    OCR results keyed by the perceptual hash of the normalized image plus its exact
+    fingerprint (SHA-256 of the normalized pixels), in a SQLite database in WAL mode.
+    Pages that differ in a few characters, like two filled-in copies of one form,
+    share a perceptual hash, so a hit needs both; such pages are kept side by side
+    and counted as mismatches when only the perceptual hash is found. OCR runs in
+    the ingest worker processes, so the cache and its hit/miss and OCR-time counters
+    live on disk where every worker and the API process see them. Bounded by entry
+    count, evicting the least recently used.
+    """
+
+    def __init__(self, path: str, max_entries: int):
+        self.max_entries = max_entries
+        self._connect = SQLiteDatabase(path).connect
+        with self._connect() as conn:
+            primary_key = [row[1] for row in sorted(conn.execute("PRAGMA table_info(entries)"), key=lambda r: r[5])
+                           if row[5]]
+            if primary_key and primary_key != ["key", "fingerprint"]:
+                # Entries from before the fingerprint was part of the key; a cache, so start over.
+                conn.execute("DROP TABLE entries")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " key TEXT NOT NULL,"
+                " fingerprint TEXT NOT NULL,"
+                " elements TEXT NOT NULL,"
+                " used_at REAL NOT NULL,"
+                " PRIMARY KEY (key, fingerprint))"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_used_at ON entries (used_at)")
+            conn.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value REAL NOT NULL)")
+            conn.executemany("INSERT OR IGNORE INTO counters (name, value) VALUES (?, 0)",
+                             [(name,) for name in _COUNTERS])
+
+    @staticmethod
+    def _count(conn, name: str, delta: float = 1):
+        conn.execute("UPDATE counters SET value = value + ? WHERE name = ?", (delta, name))
+
+    def get(self, key: str, fingerprint: str):
+        """Return the cached element dicts for key and fingerprint, else None."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT elements FROM entries WHERE key = ? AND fingerprint = ?",
+                               (key, fingerprint)).fetchone()
+            if row is None:
+                self._count(conn, "misses")
+                if conn.execute("SELECT 1 FROM entries WHERE key = ? LIMIT 1", (key,)).fetchone():
+                    # Same perceptual hash, different pixels.
+                    self._count(conn, "mismatches")
+                return None
+            conn.execute("UPDATE entries SET used_at = ? WHERE key = ? AND fingerprint = ?",
+                         (time.time(), key, fingerprint))
+            self._count(conn, "hits")
+        return json.loads(row[0])
+
+    def put(self, key: str, fingerprint: str, elements: list, ocr_seconds: float):
+        """Store the element dicts OCR produced for key and fingerprint, and account for the OCR time."""
+        with self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO entries (key, fingerprint, elements, used_at) VALUES (?, ?, ?, ?)",
+                         (key, fingerprint, json.dumps(elements), time.time()))
+            self._count(conn, "ocr_pages")
+            self._count(conn, "ocr_seconds", ocr_seconds)
+            excess = conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0] - self.max_entries
+            if excess > 0:
+                conn.execute("DELETE FROM entries WHERE rowid IN "
+                             "(SELECT rowid FROM entries ORDER BY used_at LIMIT ?)", (excess,))
+                self._count(conn, "evictions", excess)
+
+    def stats(self) -> dict:
+        conn = self._connect()
+        counters = dict(conn.execute("SELECT name, value FROM counters"))
+        lookups = counters["hits"] + counters["misses"]
+        return {
+            "entries": conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0],
+            "max_entries": self.max_entries,
+            "hits": int(counters["hits"]),
+            "misses": int(counters["misses"]),
+            "mismatches": int(counters["mismatches"]),
+            "evictions": int(counters["evictions"]),
+            "hit_rate": counters["hits"] / lookups if lookups else 0.0,
+            "ocr_pages": int(counters["ocr_pages"]),
+            "ocr_seconds": counters["ocr_seconds"],
+            "ocr_seconds_per_page": counters["ocr_seconds"] / counters["ocr_pages"] if counters["ocr_pages"] else 0.0,
+        }
+
+
+_ocr_cache = None
+_lock = threading.Lock()
+
+
+def get_ocr_cache() -> OCRCache:
+    """Open the OCR cache on first use, so importing the image agent touches no files."""
+    global _ocr_cache
+    with _lock:
+        if _ocr_cache is None:
+            _ocr_cache = OCRCache(config.OCR_CACHE_PATH, config.OCR_CACHE_MAX_ENTRIES)
+    return _ocr_cache
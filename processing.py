@@ -1,4 +1,14 @@
+import hashlib
 import mimetypes
+import os
+import tempfile
+
+import config
+
+
+class UploadTooLargeError(Exception):
+    """Raised when an upload exceeds config.MAX_UPLOAD_BYTES."""
+
 
 def get_file_type(file_path: str):
     mime_type, _ = mimetypes.guess_type(file_path)
@@ -10,3 +20,51 @@ def get_file_type(file_path: str):
         elif mime_type.startswith("text") or file_path.endswith(".pdf") or file_path.endswith(".docx"):
             return "document"
     return "unknown"
+
+
+async def save_upload(file, max_bytes: int = None):
+    """
+    Stream an UploadFile to a unique temp path in fixed-size chunks, hashing as it goes.
+
+    Each upload gets its own directory under config.TEMP_DIR so the original file name
+    (used as the chunk source) is kept without two uploads of the same name colliding.
+
+    Returns:
+        tuple: (temp_path, sha256_hex, size_in_bytes)
+
+    Raises:
+        UploadTooLargeError: if the upload is larger than max_bytes. Nothing is left on disk.
+    """
+    max_bytes = config.MAX_UPLOAD_BYTES if max_bytes is None else max_bytes
+    os.makedirs(config.TEMP_DIR, exist_ok=True)
+    upload_dir = tempfile.mkdtemp(dir=config.TEMP_DIR)
+    filename = os.path.basename(file.filename or "") or "upload"
+    temp_path = os.path.join(upload_dir, filename)
+
+    sha256 = hashlib.sha256()
+    size = 0
+    try:
+        with open(temp_path, "wb") as f:
+            while True:
+                data = await file.read(config.UPLOAD_CHUNK_SIZE)
+                if not data:
+                    break
+                size += len(data)
+                if size > max_bytes:
+                    raise UploadTooLargeError(f"Upload exceeds {max_bytes} bytes")
+                sha256.update(data)
+                f.write(data)
+    except BaseException:
+        remove_upload(temp_path)
+        raise
+    return temp_path, sha256.hexdigest(), size
+
+
+def remove_upload(temp_path: str):
+    """Delete a file written by save_upload along with its per-upload directory."""
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+    try:
+        os.rmdir(os.path.dirname(temp_path))
+    except OSError:
+        pass
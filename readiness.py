@@ -0,0 +1,67 @@
+# readiness.py
+import time
+import threading
+import logging
+
+app_logger = logging.getLogger("DocumentAI")
+app_logger.setLevel(logging.INFO)
+
+_process_started = time.perf_counter()
+_lock = threading.Lock()
+
+# name -> {"status": "pending" | "loading" | "ready" | "failed", "required": bool, "seconds": float, "error": str}
+components = {}
+
+# (stage, seconds) in the order they happened, e.g. module imports and warm-up steps
+startup_stages = []
+
+
+def register(name: str, required: bool = True):
+    with _lock:
+        components.setdefault(name, {"status": "pending", "required": required, "seconds": None, "error": None})
+
+
+def record_stage(stage: str, seconds: float):
+    with _lock:
+        startup_stages.append((stage, seconds))
+
+
+def run_component(name: str, fn):
+    """Run a blocking load step for a component, recording its status and duration."""
+    register(name)
+    with _lock:
+        components[name]["status"] = "loading"
+    started = time.perf_counter()
+    try:
+        fn()
+    except Exception as e:
+        seconds = time.perf_counter() - started
+        with _lock:
+            components[name].update(status="failed", seconds=seconds, error=str(e))
+        app_logger.error("[READINESS]: %s failed after %.2fs: %s", name, seconds, str(e))
+        return False
+    seconds = time.perf_counter() - started
+    with _lock:
+        components[name].update(status="ready", seconds=seconds, error=None)
+    record_stage(f"warm-up: {name}", seconds)
+    app_logger.info("[READINESS]: %s ready in %.2fs", name, seconds)
+    return True
+
+
+def _all_required_ready() -> bool:
+    return all(c["status"] == "ready" for c in components.values() if c["required"])
+
+
+def is_ready() -> bool:
+    with _lock:
+        return _all_required_ready()
+
+
+def report() -> dict:
+    with _lock:
+        return {
+            "ready": _all_required_ready(),
+            "uptime_seconds": time.perf_counter() - _process_started,
+            "components": {name: dict(c) for name, c in components.items()},
+            "startup": [{"stage": stage, "seconds": seconds} for stage, seconds in startup_stages],
+        }
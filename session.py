@@ -1,12 +1,411 @@
+import heapq
+import json
 import uuid
 import time
+import threading
 
-sessions = {}
+import config
+from sqlite_db import SQLiteDatabase
+
+
+class MemorySessionStore:
+    """Sessions in a process-local dict with an expiry heap. Only valid for a single worker."""
+
+    def __init__(self):
+        self._sessions = {}  # session_id -> [expires_at, next_source, version]
+        self._expiry_heap = []  # (expires_at, session_id); entries for deleted sessions are skipped lazily
+        self._pending = {}  # job_id -> [session_id, heartbeat_at]
+        self._jobs = {}  # job_id -> (job JSON, updated_at)
+        self._stored = set()  # ids of sessions with chunks in the vector store
+        self._claimed = set()  # names of one-off maintenance tasks already claimed
+        self._lock = threading.Lock()
+
+    def create(self, session_id, expires_at):
+        with self._lock:
+            self._sessions[session_id] = [expires_at, 0, 0]
+            heapq.heappush(self._expiry_heap, (expires_at, session_id))
+
+    def expires_at(self, session_id):
+        entry = self._sessions.get(session_id)
+        return entry[0] if entry else None
+
+    def delete(self, session_id):
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def pop_expired(self, now):
+        expired = []
+        with self._lock:
+            while self._expiry_heap and self._expiry_heap[0][0] <= now:
+                _, session_id = heapq.heappop(self._expiry_heap)
+                if self._sessions.pop(session_id, None) is not None:
+                    expired.append(session_id)
+        return expired
+
+    def add_pending_job(self, job_id, session_id, now):
+        with self._lock:
+            self._pending[job_id] = [session_id, now]
+
+    def remove_pending_job(self, job_id):
+        with self._lock:
+            self._pending.pop(job_id, None)
+
+    def heartbeat_pending_jobs(self, job_ids, now):
+        with self._lock:
+            for job_id in job_ids:
+                if job_id in self._pending:
+                    self._pending[job_id][1] = now
+
+    def has_pending_jobs(self, session_id, cutoff):
+        with self._lock:
+            return any(s == session_id and heartbeat_at > cutoff for s, heartbeat_at in self._pending.values())
+
+    def prune_pending_jobs(self, cutoff):
+        with self._lock:
+            for job_id in [j for j, (_, heartbeat_at) in self._pending.items() if heartbeat_at <= cutoff]:
+                del self._pending[job_id]
+
+    def save_job(self, job_id, session_id, data, updated_at):
+        with self._lock:
+            self._jobs[job_id] = (data, updated_at)
+
+    def load_job(self, job_id):
+        entry = self._jobs.get(job_id)
+        return entry[0] if entry else None
+
+    def prune_jobs(self, cutoff):
+        with self._lock:
+            for job_id in [j for j, (_, updated_at) in self._jobs.items()
+                           if updated_at < cutoff and j not in self._pending]:
+                del self._jobs[job_id]
+
+    def allocate_sources(self, session_id, count):
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return None
+            entry[1] += count
+            return entry[1] - count
+
+    def bump_version(self, session_id):
+        with self._lock:
+            self._stored.add(session_id)
+            entry = self._sessions.get(session_id)
+            if entry is not None:
+                entry[2] += 1
+
+    def version(self, session_id):
+        entry = self._sessions.get(session_id)
+        return entry[2] if entry else 0
+
+    def add_stored(self, session_ids):
+        with self._lock:
+            self._stored.update(session_ids)
+
+    def remove_stored(self, session_id):
+        with self._lock:
+            self._stored.discard(session_id)
+
+    def orphaned(self):
+        with self._lock:
+            return [session_id for session_id in self._stored if session_id not in self._sessions]
+
+    def claim(self, name):
+        with self._lock:
+            if name in self._claimed:
+                return False
+            self._claimed.add(name)
+            return True
+
+    def release(self, name):
+        with self._lock:
+            self._claimed.discard(name)
+
+    def count(self):
+        return len(self._sessions)
+
+
+class SQLiteSessionStore:
+    """
+    Sessions in a SQLite database in WAL mode, shared by every worker process on
+    the host. Readers never block the writer, and expiry uses an index on expires_at.
+    Pending ingest jobs are rows with a heartbeat, so the jobs of a worker that died
+    stop counting once their heartbeat is older than JOB_STALE_SECONDS. Job status is
+    stored as JSON, so any worker can answer GET /jobs/{job_id}. Sessions that were
+    given chunks are recorded too, so compaction finds the vectors of sessions that
+    are gone without scanning the vector store.
+    """
+
+    def __init__(self, path):
+        self._connect = SQLiteDatabase(path).connect
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                " session_id TEXT PRIMARY KEY,"
+                " expires_at REAL NOT NULL,"
+                " next_source INTEGER NOT NULL DEFAULT 0,"
+                " version INTEGER NOT NULL DEFAULT 0)"
+            )
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(sessions)")}
+            for column in ("next_source", "version"):
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE sessions ADD COLUMN {column} INTEGER NOT NULL DEFAULT 0")
+            conn.execute("CREATE INDEX IF NOT EXISTS sessions_expires_at ON sessions (expires_at)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS pending_jobs ("
+                " job_id TEXT PRIMARY KEY,"
+                " session_id TEXT NOT NULL,"
+                " heartbeat_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS pending_jobs_session ON pending_jobs (session_id)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " job_id TEXT PRIMARY KEY,"
+                " session_id TEXT NOT NULL,"
+                " data TEXT NOT NULL,"
+                " updated_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_updated_at ON jobs (updated_at)")
+            conn.execute("CREATE TABLE IF NOT EXISTS stored_sessions (session_id TEXT PRIMARY KEY)")
+            conn.execute("CREATE TABLE IF NOT EXISTS maintenance (name TEXT PRIMARY KEY, claimed_at REAL NOT NULL)")
+
+    def create(self, session_id, expires_at):
+        with self._connect() as conn:
+            conn.execute("INSERT INTO sessions (session_id, expires_at) VALUES (?, ?)", (session_id, expires_at))
+
+    def expires_at(self, session_id):
+        row = self._connect().execute(
+            "SELECT expires_at FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        return row[0] if row else None
+
+    def delete(self, session_id):
+        with self._connect() as conn:
+            return conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,)).rowcount > 0
+
+    def pop_expired(self, now):
+        conn = self._connect()
+        with conn:
+            # BEGIN IMMEDIATE so two workers compacting at once never both claim a session.
+            conn.execute("BEGIN IMMEDIATE")
+            expired = [row[0] for row in conn.execute(
+                "SELECT session_id FROM sessions WHERE expires_at <= ? ORDER BY expires_at", (now,))]
+            conn.execute("DELETE FROM sessions WHERE expires_at <= ?", (now,))
+        return expired
+
+    def add_pending_job(self, job_id, session_id, now):
+        with self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO pending_jobs (job_id, session_id, heartbeat_at) VALUES (?, ?, ?)",
+                         (job_id, session_id, now))
+
+    def remove_pending_job(self, job_id):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM pending_jobs WHERE job_id = ?", (job_id,))
+
+    def heartbeat_pending_jobs(self, job_ids, now):
+        with self._connect() as conn:
+            conn.executemany("UPDATE pending_jobs SET heartbeat_at = ? WHERE job_id = ?",
+                             [(now, job_id) for job_id in job_ids])
+
+    def has_pending_jobs(self, session_id, cutoff):
+        return self._connect().execute(
+            "SELECT 1 FROM pending_jobs WHERE session_id = ? AND heartbeat_at > ? LIMIT 1",
+            (session_id, cutoff)).fetchone() is not None
+
+    def prune_pending_jobs(self, cutoff):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM pending_jobs WHERE heartbeat_at <= ?", (cutoff,))
+
+    def save_job(self, job_id, session_id, data, updated_at):
+        with self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO jobs (job_id, session_id, data, updated_at) VALUES (?, ?, ?, ?)",
+                         (job_id, session_id, data, updated_at))
+
+    def load_job(self, job_id):
+        row = self._connect().execute("SELECT data FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return row[0] if row else None
+
+    def prune_jobs(self, cutoff):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM jobs WHERE updated_at < ? AND job_id NOT IN (SELECT job_id FROM pending_jobs)",
+                         (cutoff,))
+
+    def allocate_sources(self, session_id, count):
+        conn = self._connect()
+        with conn:
+            # BEGIN IMMEDIATE so concurrent uploads to one session on different workers get disjoint ranges.
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT next_source FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE sessions SET next_source = ? WHERE session_id = ?", (row[0] + count, session_id))
+        return row[0]
+
+    def bump_version(self, session_id):
+        with self._connect() as conn:
+            conn.execute("INSERT OR IGNORE INTO stored_sessions (session_id) VALUES (?)", (session_id,))
+            conn.execute("UPDATE sessions SET version = version + 1 WHERE session_id = ?", (session_id,))
+
+    def version(self, session_id):
+        row = self._connect().execute("SELECT version FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        return row[0] if row else 0
+
+    def add_stored(self, session_ids):
+        with self._connect() as conn:
+            conn.executemany("INSERT OR IGNORE INTO stored_sessions (session_id) VALUES (?)",
+                             [(session_id,) for session_id in session_ids])
+
+    def remove_stored(self, session_id):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM stored_sessions WHERE session_id = ?", (session_id,))
+
+    def orphaned(self):
+        return [row[0] for row in self._connect().execute(
+            "SELECT session_id FROM stored_sessions WHERE session_id NOT IN (SELECT session_id FROM sessions)")]
+
+    def claim(self, name):
+        with self._connect() as conn:
+            return conn.execute("INSERT OR IGNORE INTO maintenance (name, claimed_at) VALUES (?, ?)",
+                                (name, time.time())).rowcount > 0
+
+    def release(self, name):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM maintenance WHERE name = ?", (name,))
+
+    def count(self):
+        return self._connect().execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+
+def _create_store():
+    if config.SESSION_STORE == "sqlite":
+        return SQLiteSessionStore(config.SESSION_DB_PATH)
+    if config.SESSION_STORE == "memory":
+        return MemorySessionStore()
+    raise ValueError(f"Unknown SESSION_STORE: {config.SESSION_STORE}")
+
+
+store = _create_store()
+
+# session_id -> (expires_at, cached_at). Only positive lookups are cached, so a session
+# created on another worker is visible at once and a deletion within SESSION_CACHE_SECONDS.
+_validity_cache = {}
+_lock = threading.Lock()
+
+stats = {"expired": 0, "deleted": 0, "reclaimed_vectors": 0}
 
 def create_session():
     session_id = str(uuid.uuid4())
-    sessions[session_id] = time.time()
+    store.create(session_id, time.time() + config.SESSION_TIMEOUT_SECONDS)
     return session_id
 
 def is_valid_session(session_id):
-    return session_id in sessions and time.time() - sessions[session_id] < 3600
+    now = time.time()
+    cached = _validity_cache.get(session_id)
+    if cached is not None and now - cached[1] < config.SESSION_CACHE_SECONDS:
+        expires_at = cached[0]
+    else:
+        expires_at = store.expires_at(session_id)
+        if expires_at is None:
+            _validity_cache.pop(session_id, None)
+            return False
+        if len(_validity_cache) >= config.SESSION_CACHE_MAX_ENTRIES:
+            _validity_cache.clear()
+        _validity_cache[session_id] = (expires_at, now)
+    return now < expires_at
+
+def session_exists(session_id):
+    return store.expires_at(session_id) is not None
+
+def delete_session(session_id):
+    """Forget a session. Returns False if it did not exist."""
+    _validity_cache.pop(session_id, None)
+    if not store.delete(session_id):
+        return False
+    with _lock:
+        stats["deleted"] += 1
+    return True
+
+def expire_sessions(now=None):
+    """Remove every session whose TTL has passed, in expiry order, and return their ids."""
+    expired = store.pop_expired(time.time() if now is None else now)
+    for session_id in expired:
+        _validity_cache.pop(session_id, None)
+    with _lock:
+        stats["expired"] += len(expired)
+    return expired
+
+def add_pending_job(session_id, job_id):
+    store.add_pending_job(job_id, session_id, time.time())
+
+def finish_pending_job(job_id):
+    store.remove_pending_job(job_id)
+
+def heartbeat_pending_jobs(job_ids):
+    """Mark jobs still being worked on by this process; see JOB_STALE_SECONDS."""
+    if job_ids:
+        store.heartbeat_pending_jobs(job_ids, time.time())
+
+def has_pending_jobs(session_id):
+    return store.has_pending_jobs(session_id, time.time() - config.JOB_STALE_SECONDS)
+
+def prune_pending_jobs():
+    """Drop pending jobs whose worker stopped sending heartbeats (crashed or restarted)."""
+    store.prune_pending_jobs(time.time() - config.JOB_STALE_SECONDS)
+
+def save_job(job):
+    """Store a job's status dict, where GET /jobs/{job_id} on any worker finds it."""
+    store.save_job(job["job_id"], job["session_id"], json.dumps(job), job["updated_at"])
+
+def load_job(job_id):
+    data = store.load_job(job_id)
+    return json.loads(data) if data is not None else None
+
+def prune_jobs():
+    """Drop jobs that are no longer pending and have not changed for JOB_RETENTION_SECONDS."""
+    store.prune_jobs(time.time() - config.JOB_RETENTION_SECONDS)
+
+def allocate_sources(session_id, count=1):
+    """
+    Reserve count consecutive source indexes in a session, one per uploaded file, and
+    return the first. Returns None if the session does not exist.
+    """
+    return store.allocate_sources(session_id, count)
+
+def bump_session_version(session_id):
+    """
+    Record that a session's chunks changed, so answers cached by any worker become
+    stale and compaction knows the session has vectors to purge once it is gone.
+    """
+    store.bump_version(session_id)
+
+def record_stored_sessions(session_ids):
+    """Record sessions found in the vector store (see bump_session_version)."""
+    store.add_stored(session_ids)
+
+def forget_stored_session(session_id):
+    """Call once a session's vectors are purged."""
+    store.remove_stored(session_id)
+
+def orphaned_sessions():
+    """Sessions that were given chunks but no longer exist, so their vectors can go."""
+    return store.orphaned()
+
+def claim_maintenance(name):
+    """
+    Claim a one-off maintenance task. True for exactly one caller across all workers
+    sharing the store; release_maintenance lets a failed run be retried.
+    """
+    return store.claim(name)
+
+def release_maintenance(name):
+    store.release(name)
+
+def session_version(session_id):
+    return store.version(session_id)
+
+def record_reclaimed_vectors(count):
+    with _lock:
+        stats["reclaimed_vectors"] += count
+
+def session_stats():
+    with _lock:
+        return {"live": store.count(), "store": config.SESSION_STORE, **stats}
@@ -0,0 +1,28 @@
+# sqlite_db.py
+import os
+import sqlite3
+import threading
+
+
+class SQLiteDatabase:
+    """
+    A SQLite database file in WAL mode, shared by every process on the host; readers
+    never block the writer. Used by the session store and the OCR cache.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.connect().execute("PRAGMA journal_mode=WAL")
+
+    def connect(self) -> sqlite3.Connection:
+        # One connection per thread; sqlite3 connections must not be shared across threads.
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
@@ -0,0 +1,154 @@
+# telemetry.py
+"""
+Per-stage latency histograms and counters, exported in the Prometheus text format
+by GET /metrics, plus the switch that decides when full payloads get logged.
+
+Metrics are kept per process: ingest worker processes do not report here, so
+partition/transcription stages are timed by the parent around the pool call.
+"""
+import bisect
+import random
+import threading
+import time
+import logging
+from contextlib import contextmanager
+
+import config
+
+app_logger = logging.getLogger("DocumentAI")
+app_logger.setLevel(logging.INFO)
+
+# Upper bounds in seconds; a partition or transcription stage can take minutes.
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+COUNT_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class Histogram:
+    """Cumulative-bucket histogram with one series per label set."""
+
+    def __init__(self, name: str, help_text: str, label_names: tuple, buckets: tuple):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series = {}  # label values -> [per-bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[bisect.bisect_left(self.buckets, value)] += 1
+            series[-1] += value
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = {labels: list(series) for labels, series in self._series.items()}
+        for label_values, series in sorted(snapshot.items()):
+            labels = _format_labels(self.label_names, label_values)
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series):
+                cumulative += count
+                le = _format_labels(self.label_names + ("le",), label_values + (str(bound),))
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            lines.append(f"{self.name}_sum{labels} {series[-1]}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, label_names: tuple):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, *label_values):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            snapshot = dict(self._values)
+        for label_values, value in sorted(snapshot.items()):
+            lines.append(f"{self.name}{_format_labels(self.label_names, label_values)} {value}")
+        return lines
+
+
+def _format_labels(names: tuple, values: tuple) -> str:
+    if not names:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n") for v in values)
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(names, escaped)) + "}"
+
+
+stage_seconds = Histogram("documentai_stage_seconds", "Time spent in each stage of a request or ingest job.",
+                          ("operation", "stage"), SECONDS_BUCKETS)
+chunk_counts = Histogram("documentai_chunks", "Chunks produced per ingest job or passed to the LLM per question.",
+                         ("operation",), COUNT_BUCKETS)
+token_counts = Histogram("documentai_tokens", "Approximate tokens in the LLM prompt context and answer.",
+                         ("kind",), COUNT_BUCKETS)
+outcomes = Counter("documentai_requests_total", "Requests and ingest jobs by outcome.", ("operation", "outcome"))
+reclaimed_vectors = Counter("documentai_reclaimed_vectors_total",
+                            "Vectors deleted with their session, by why the session was purged.", ("reason",))
+
+_metrics = (stage_seconds, chunk_counts, token_counts, outcomes, reclaimed_vectors)
+
+
+def observe_stage(operation: str, stage: str, seconds: float):
+    stage_seconds.observe(seconds, operation, stage)
+
+
+@contextmanager
+def timed(operation: str, stage: str):
+    """Time the enclosed block into documentai_stage_seconds, whether or not it raises."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        stage_seconds.observe(time.perf_counter() - started, operation, stage)
+
+
+def observe_chunks(operation: str, count: int):
+    chunk_counts.observe(count, operation)
+
+
+def observe_tokens(kind: str, count: int):
+    token_counts.observe(count, kind)
+
+
+def count_outcome(operation: str, outcome: str):
+    outcomes.inc(1, operation, outcome)
+
+
+def count_reclaimed(reason: str, vectors: int):
+    reclaimed_vectors.inc(vectors, reason)
+
+
+def render(gauges: dict = None) -> str:
+    """
+    Render every metric in the Prometheus text exposition format. gauges maps a
+    metric name to (help text, value) for point-in-time values such as cache sizes.
+    """
+    lines = []
+    for metric in _metrics:
+        lines.extend(metric.render())
+    for name, (help_text, value) in (gauges or {}).items():
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge", f"{name} {value}"]
+    return "\n".join(lines) + "\n"
+
+
+def log_payloads() -> bool:
+    """
+    Whether the current request should log full payloads (queries, raw Chroma results,
+    chunk previews). Always on with the DocumentAI logger at DEBUG, otherwise for a
+    LOG_PAYLOAD_SAMPLE_RATE fraction of calls.
+    """
+    if app_logger.isEnabledFor(logging.DEBUG):
+        return True
+    rate = config.LOG_PAYLOAD_SAMPLE_RATE
+    return rate > 0 and random.random() < rate
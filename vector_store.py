@@ -1,9 +1,16 @@
 import os
 import re
-import chromadb
-from chromadb.utils import embedding_functions
+import hashlib
+import threading
+import time
+from collections import OrderedDict
 from config import VECTOR_STORE_PATH
 import config
+import telemetry
+from answer_cache import answer_cache
+from embedding import embedding_service
+from lexical_index import add_to_lexical_index, delete_lexical_index, search_lexical_index, tokenize
+from session import bump_session_version, forget_stored_session
 import logging
 
 # Use the custom app logger
@@ -12,13 +19,98 @@ app_logger.setLevel(logging.INFO)
 
 logging.getLogger("chromadb").setLevel(logging.ERROR)
 
-# Initialize ChromaDB Persistent Client and Collection with explicit HNSW config
-client = chromadb.PersistentClient(path=VECTOR_STORE_PATH)
-collection = client.get_or_create_collection(
-    name="document_chunks",
-    embedding_function=embedding_functions.SentenceTransformerEmbeddingFunction(model_name="all-MiniLM-L6-v2"),
-    metadata={"hnsw:space": "cosine"}  # Optional: explicit HNSW config for consistency
-)
+# chromadb is imported and the client opened on first use, so importing this module stays cheap.
+_client = None
+_collection = None
+_embedding_function = None
+_client_lock = threading.Lock()
+
+def _make_embedding_function():
+    from chromadb.api.types import EmbeddingFunction
+
+    class SharedEmbeddingFunction(EmbeddingFunction):
+        """Chroma embedding function backed by the process-wide embedding service."""
+
+        def __call__(self, input):
+            return embedding_service.embed(list(input))
+
+    return SharedEmbeddingFunction()
+
+def get_client():
+    """Return the ChromaDB Persistent Client, creating it and the global collection on first use."""
+    global _client, _collection, _embedding_function
+    with _client_lock:
+        if _client is None:
+            import chromadb
+            _embedding_function = _make_embedding_function()
+            client = chromadb.PersistentClient(path=VECTOR_STORE_PATH)
+            _collection = client.get_or_create_collection(
+                name="document_chunks",
+                embedding_function=_embedding_function,
+                metadata={"hnsw:space": "cosine"}  # Optional: explicit HNSW config for consistency
+            )
+            _client = client
+    return _client
+
+def get_global_collection():
+    """The shared "document_chunks" collection used by the "global" layout."""
+    get_client()
+    return _collection
+
+# Chunk positions are unique per session: source i of a session (an uploaded file) uses
+# positions i * SOURCE_POSITION_STRIDE onwards, so sources never overwrite each other and
+# neighbour lookups stay inside one source. A session's first source keeps 0, 1, 2, ...
+SOURCE_POSITION_STRIDE = 1_000_000
+
+# Collection handles for the "session" and "bucket" layouts, most recently used last
+_collections = OrderedDict()
+_collections_lock = threading.Lock()
+
+def collection_name(session_id: str, layout: str = None) -> str:
+    """Name of the collection holding a session's chunks under the given layout."""
+    layout = config.VECTOR_STORE_LAYOUT if layout is None else layout
+    if layout == "global":
+        return "document_chunks"
+    if layout == "session":
+        return f"session_{session_id}"
+    if layout == "bucket":
+        bucket = int(hashlib.sha1(session_id.encode()).hexdigest(), 16) % config.VECTOR_STORE_BUCKETS
+        return f"document_chunks_{bucket:03d}"
+    raise ValueError(f"Unknown VECTOR_STORE_LAYOUT: {layout}")
+
+def get_collection(session_id: str, create: bool = True, layout: str = None):
+    """
+    Return the collection for a session, or None if it does not exist and create is False.
+    Handles are kept in an LRU of config.COLLECTION_CACHE_SIZE.
+    """
+    name = collection_name(session_id, layout)
+    if name == "document_chunks":
+        return get_global_collection()
+    with _collections_lock:
+        handle = _collections.get(name)
+        if handle is not None:
+            _collections.move_to_end(name)
+            return handle
+    try:
+        if create:
+            handle = get_client().get_or_create_collection(
+                name=name, embedding_function=_embedding_function, metadata={"hnsw:space": "cosine"})
+        else:
+            handle = get_client().get_collection(name=name, embedding_function=_embedding_function)
+    except Exception:
+        if create:
+            raise
+        return None
+    with _collections_lock:
+        _collections[name] = handle
+        while len(_collections) > config.COLLECTION_CACHE_SIZE:
+            _collections.popitem(last=False)
+    return handle
+
+def session_filter(session_id: str, layout: str = None):
+    """Metadata filter for a session; unnecessary when it has a collection of its own."""
+    layout = config.VECTOR_STORE_LAYOUT if layout is None else layout
+    return None if layout == "session" else {"session_id": session_id}
 
 # Define a custom stop words set (you can adjust as needed)
 stop_words = set([
@@ -50,135 +142,334 @@ def normalize_text(text):
     text = text.lower()
     return re.sub(r'[^\w\s]', '', text)
 
-def add_chunks_to_vector_store(session_id: str, chunks: list):
-    app_logger.info("[VECTOR STORE]: Adding Chunks to Vector Store Started")
-    if all(isinstance(chunk, str) for chunk in chunks):
-        chunks = [{"text": chunk, "source": "unknown", "type": "Unknown"} for chunk in chunks]
-    
-    documents = [chunk["text"] for chunk in chunks]
-    metadatas = []
-    last_title = None
-    for i, chunk in enumerate(chunks):
-        if chunk.get("type", "").lower() == "title":
-            last_title = chunk["text"]
-        metadatas.append({
-            "source": chunk.get("source", "unknown"),
-            "type": chunk.get("type", "Unknown"),
-            "session_id": session_id,
-            "position": i,
-            "linked_title": last_title or "None"
-        })
-    ids = [f"{session_id}_{i}" for i in range(len(chunks))]
-    preview = f"{documents[:3]}, ..." if len(chunks) > 3 else str(documents[:3])
-    app_logger.info("[VECTOR STORE]: Vector Stored Chunks Preview: %s", preview)
-    collection.upsert(documents=documents, metadatas=metadatas, ids=ids)
-
-def query_chunks(session_id: str, query: str, n_results: int = 5):
-    app_logger.info("[VECTOR STORE]: Querying Chunks")
-    app_logger.info("[VECTOR STORE]: Session ID: %s, Query: %s, N Results: %d", session_id, query, n_results)
+def source_position(source_index: int, local_position: int) -> int:
+    """Session-wide position of a source's chunk; each source owns a block of SOURCE_POSITION_STRIDE."""
+    return source_index * SOURCE_POSITION_STRIDE + local_position
+
+def add_sources_to_vector_store(session_id: str, sources: list) -> list:
+    """
+    Upsert the chunks of several sources of a session in one bulk write and return
+    the embeddings used, one list per source.
+
+    Each source is a dict with "chunks", its "source_index" in the session (0 if
+    omitted), optional precomputed "embeddings" (e.g. from the ingest cache) and
+    optional "start_position" to append after chunks already stored for that source.
+    Chunks without embeddings are embedded together in a single call.
+    """
+    documents, metadatas, positions = [], [], []
+    spans = []  # (offset into documents, chunk count) per source
+    for source in sources:
+        chunks = source["chunks"]
+        spans.append((len(documents), len(chunks)))
+        if all(isinstance(chunk, str) for chunk in chunks):
+            chunks = [{"text": chunk, "source": "unknown", "type": "Unknown"} for chunk in chunks]
+        first = source_position(source.get("source_index", 0), source.get("start_position", 0))
+        last_title = None
+        for i, chunk in enumerate(chunks):
+            if chunk.get("type", "").lower() == "title":
+                last_title = chunk["text"]
+            metadata = {
+                "source": chunk.get("source", "unknown"),
+                "type": chunk.get("type", "Unknown"),
+                "session_id": session_id,
+                "position": first + i,
+                "linked_title": last_title or "None"
+            }
+            # Audio chunks carry the time span they were transcribed from.
+            for key in ("start_time", "end_time"):
+                if chunk.get(key) is not None:
+                    metadata[key] = chunk[key]
+            documents.append(chunk["text"])
+            metadatas.append(metadata)
+            positions.append(first + i)
+    if not documents:
+        return [[] for _ in sources]
+    ids = [f"{session_id}_{pos}" for pos in positions]
+    if telemetry.log_payloads():
+        preview = f"{documents[:3]}, ..." if len(documents) > 3 else str(documents[:3])
+        app_logger.info("[VECTOR STORE]: Vector Stored Chunks Preview: %s", preview)
+
+    # Embed every chunk that has no precomputed embedding in one call.
+    missing = [i for i, source in enumerate(sources) if source.get("embeddings") is None and spans[i][1]]
+    per_source = [list(source.get("embeddings") or []) for source in sources]
+    if missing:
+        texts = [text for i in missing for text in documents[spans[i][0]:spans[i][0] + spans[i][1]]]
+        with telemetry.timed("ingest", "embed"):
+            vectors = embedding_service.embed(texts)
+        cursor = 0
+        for i in missing:
+            per_source[i] = vectors[cursor:cursor + spans[i][1]]
+            cursor += spans[i][1]
+    embeddings = [vector for vectors in per_source for vector in vectors]
+
+    with telemetry.timed("ingest", "upsert"):
+        collection = get_collection(session_id)
+        step = get_client().get_max_batch_size()
+        for begin in range(0, len(ids), step):
+            collection.upsert(documents=documents[begin:begin + step], metadatas=metadatas[begin:begin + step],
+                              ids=ids[begin:begin + step], embeddings=embeddings[begin:begin + step])
+    with telemetry.timed("ingest", "lexical_index"):
+        add_to_lexical_index(session_id, documents, positions)
+    # Cached answers of every worker check the shared version; local entries can go now.
+    bump_session_version(session_id)
+    answer_cache.forget_session(session_id)
+    app_logger.info("[VECTOR STORE]: Stored %d chunks from %d sources for session %s",
+                    len(documents), len(sources), session_id)
+    return per_source
+
+def add_chunks_to_vector_store(session_id: str, chunks: list, embeddings: list = None, start_position: int = 0,
+                               source_index: int = 0):
+    """
+    Upsert one source's chunks for a session and return the embeddings used. Pass
+    precomputed embeddings (e.g. from the ingest cache) to skip running the embedder,
+    and start_position to append after chunks already stored for the source.
+    """
+    return add_sources_to_vector_store(session_id, [{"chunks": chunks, "embeddings": embeddings,
+                                                     "start_position": start_position,
+                                                     "source_index": source_index}])[0]
+
+def purge_session_data(session_id: str, batch_size: int = None) -> int:
+    """
+    Delete a session's vectors in batches, along with its lexical index and cached
+    answers. Returns the number of vectors removed.
+    """
+    batch_size = config.SESSION_PURGE_BATCH_SIZE if batch_size is None else batch_size
+    removed = 0
+    session_collection = get_collection(session_id, create=False)
+    if session_collection is not None and config.VECTOR_STORE_LAYOUT == "session":
+        # The whole collection belongs to the session; dropping it is one call.
+        removed = session_collection.count()
+        with _collections_lock:
+            _collections.pop(session_collection.name, None)
+        get_client().delete_collection(session_collection.name)
+    elif session_collection is not None:
+        while True:
+            batch = session_collection.get(where={"session_id": session_id}, limit=batch_size, include=[])
+            if not batch["ids"]:
+                break
+            session_collection.delete(ids=batch["ids"])
+            removed += len(batch["ids"])
+    delete_lexical_index(session_id)
+    answer_cache.forget_session(session_id)
+    forget_stored_session(session_id)
+    app_logger.info("[VECTOR STORE]: Purged %d vectors for session %s", removed, session_id)
+    return removed
+
+def list_stored_sessions(page_size: int = None) -> set:
+    """
+    Ids of every session with vectors under the current layout: collection names
+    for the "session" layout, otherwise the session_id metadata, read page by page.
+    A full scan, so it only runs once per session store, to record the sessions
+    stored before the store tracked them (see session.orphaned_sessions).
+    """
+    page_size = config.SESSION_PURGE_BATCH_SIZE if page_size is None else page_size
+    layout = config.VECTOR_STORE_LAYOUT
+    sessions = set()
+    for collection in get_client().list_collections():
+        name = getattr(collection, "name", collection)  # chromadb 0.6 returns names
+        if layout == "session":
+            if name.startswith("session_"):
+                sessions.add(name[len("session_"):])
+            continue
+        if not (name == "document_chunks" if layout == "global" else name.startswith("document_chunks_")):
+            continue
+        handle = get_client().get_collection(name=name, embedding_function=_embedding_function)
+        offset = 0
+        while True:
+            page = handle.get(limit=page_size, offset=offset, include=["metadatas"])
+            if not page["ids"]:
+                break
+            offset += len(page["ids"])
+            sessions.update(meta["session_id"] for meta in page["metadatas"] if meta and meta.get("session_id"))
+    return sessions
+
+def remove_stop_words(query: str) -> list:
+    """Lowercase the query, split on whitespace and drop stop words."""
+    return [word for word in query.lower().split() if word not in stop_words]
+
+def embed_query(query: str):
+    """Embed a query the way query_chunks does: stop words removed."""
+    return embedding_service.embed([' '.join(remove_stop_words(query))])[0]
+
+def _to_chunk(doc, meta):
+    chunk = {
+        "chunk": doc,
+        "source": meta.get("source"),
+        "type": meta.get("type"),
+        "linked_title": meta.get("linked_title", ""),
+        "position": meta.get("position", -1),
+        "start_time": meta.get("start_time"),
+        "end_time": meta.get("end_time")
+    }
+    # Tokenize once per chunk; scoring and title matching reuse these.
+    chunk["_text_tokens"] = set(tokenize(str(doc)))
+    chunk["_title_tokens"] = set(tokenize(str(chunk["linked_title"])))
+    return chunk
+
+def query_chunks(session_id: str, query: str, n_results: int = 5, neighbor_window: int = None,
+                 query_embedding=None):
+    """
+    Retrieve the top chunks for a query within a session.
+
+    Candidates come from the vector index and the session's BM25 index. Title hits
+    that mention a query term, and text hits whose section title does, pull in the
+    neighbouring text chunks of the same section (up to neighbor_window positions
+    either side, config.NEIGHBOR_WINDOW by default). The vector rank, BM25 rank and
+    structural relevance rank are combined with reciprocal-rank fusion.
+    Pass query_embedding (from embed_query) to reuse an embedding computed earlier.
+    """
+    if neighbor_window is None:
+        neighbor_window = config.NEIGHBOR_WINDOW
+    n_candidates = n_results * config.RETRIEVAL_OVERFETCH
+    log_payloads = telemetry.log_payloads()
+    if log_payloads:
+        app_logger.info("[VECTOR STORE]: Session ID: %s, Query: %s, N Results: %d", session_id, query, n_results)
     
     # Remove stop words from query
-    all_words = query.lower().split()
-    all_query_terms = [word for word in all_words if word not in stop_words]
-    app_logger.info("[VECTOR STORE]: Query Terms after removing stop words: %s", all_query_terms)
+    all_query_terms = remove_stop_words(query)
+    if log_payloads:
+        app_logger.info("[VECTOR STORE]: Query Terms after removing stop words: %s", all_query_terms)
+    match_terms = tokenize(' '.join(all_query_terms))
     
     # Build a query string for embedding using only the filtered query terms
     query_for_embedding = ' '.join(all_query_terms)
     
-    results = collection.query(
-        query_texts=[query_for_embedding],
-        n_results=n_results * 5,
-        where={"session_id": session_id},
-        include=["documents", "metadatas"]
-    )
-    app_logger.info("[VECTOR STORE]: Query Results: %s", results)
-    # Build raw_chunks list from query results
-    raw_chunks = [
-        {
-            "chunk": doc,
-            "source": meta.get("source"),
-            "type": meta.get("type"),
-            "linked_title": meta.get("linked_title", ""),
-            "position": meta.get("position", -1)
-        }
-        for doc, meta in zip(results["documents"][0], results["metadatas"][0])
-    ]
-    
-    # Look for title chunks that match query terms and attempt to fetch the associated text chunk
-    existing_positions = {chunk['position'] for chunk in raw_chunks}
-    additional_chunks = []
-    for chunk in raw_chunks:
-        if chunk['type'].lower() == 'title' and any(term in normalize_text(chunk['chunk']) for term in all_query_terms):
-            next_pos = chunk['position'] + 1
-            if next_pos not in existing_positions:
-                next_id = f"{session_id}_{next_pos}"
-                next_result = collection.get(ids=[next_id])
-                if next_result['documents']:
-                    next_meta = next_result['metadatas'][0]
-                    # If the next chunk is of type 'text' and its linked_title matches the current title, add it
-                    if next_meta.get('type', '').lower() == 'text' and next_meta.get('linked_title') == chunk['chunk']:
-                        additional_chunks.append({
-                            'chunk': next_result['documents'][0],
-                            'source': next_meta.get('source'),
-                            'type': next_meta.get('type'),
-                            'linked_title': next_meta.get('linked_title'),
-                            'position': next_meta.get('position')
-                        })
-                        existing_positions.add(next_pos)
-    
-    # Combine raw_chunks and additional_chunks
-    all_chunks = raw_chunks + additional_chunks
-    
+    session_collection = get_collection(session_id, create=False)
+    if session_collection is None:
+        app_logger.info("[VECTOR STORE]: No chunks stored for session %s", session_id)
+        return []
+    if query_embedding is None:
+        with telemetry.timed("ask", "query_embedding"):
+            query_embedding = embedding_service.embed([query_for_embedding])[0]
+    with telemetry.timed("ask", "vector_query"):
+        results = session_collection.query(
+            query_embeddings=[query_embedding],
+            n_results=n_candidates,
+            where=session_filter(session_id),
+            include=["documents", "metadatas"]
+        )
+    if log_payloads:
+        app_logger.info("[VECTOR STORE]: Query Results: %s", results)
+    # Build raw_chunks list from query results, indexed by position
+    raw_chunks = [_to_chunk(doc, meta) for doc, meta in zip(results["documents"][0], results["metadatas"][0])]
+    by_position = {chunk['position']: chunk for chunk in raw_chunks}
+    vector_rank = {chunk['position']: rank for rank, chunk in enumerate(raw_chunks)}
+
+    # Exact keyword hits from BM25; fetch the ones the vector search missed in one round trip
+    with telemetry.timed("ask", "lexical_query"):
+        lexical_hits = search_lexical_index(session_id, match_terms, n_candidates)
+    lexical_rank = {pos: rank for rank, (pos, _) in enumerate(lexical_hits)}
+    missing = [pos for pos, _ in lexical_hits if pos not in by_position]
+    if missing:
+        with telemetry.timed("ask", "lexical_fetch"):
+            fetched = session_collection.get(ids=[f"{session_id}_{pos}" for pos in missing],
+                                             include=["documents", "metadatas"])
+        for doc, meta in zip(fetched['documents'], fetched['metadatas']):
+            chunk = _to_chunk(doc, meta)
+            by_position[chunk['position']] = chunk
+    hits = list(by_position.values())
+
+    def mentions_query(tokens):
+        return any(term in tokens for term in match_terms)
+
+    # Collect the neighbour positions of every hit whose section matches the query
+    wanted = {}
+    anchor = {}
+    for chunk in hits:
+        chunk_type = str(chunk['type']).lower()
+        if chunk_type == 'title' and mentions_query(chunk['_text_tokens']):
+            section = chunk['chunk']
+        elif chunk_type == 'text' and mentions_query(chunk['_title_tokens']):
+            section = chunk['linked_title']
+        else:
+            continue
+        pos = chunk['position']
+        for offset in range(-neighbor_window, neighbor_window + 1):
+            neighbor_pos = pos + offset
+            if offset and neighbor_pos >= 0 and neighbor_pos not in by_position and neighbor_pos not in wanted:
+                wanted[neighbor_pos] = section
+                anchor[neighbor_pos] = pos
+
+    # Fetch all neighbours in one round trip; keep text chunks of the same section
+    if wanted:
+        with telemetry.timed("ask", "neighbor_fetch"):
+            neighbors = session_collection.get(
+                ids=[f"{session_id}_{pos}" for pos in wanted],
+                include=["documents", "metadatas"]
+            )
+        for doc, meta in zip(neighbors['documents'], neighbors['metadatas']):
+            pos = meta.get('position')
+            if (pos in wanted and pos not in by_position
+                    and str(meta.get('type', '')).lower() == 'text'
+                    and meta.get('linked_title') == wanted[pos]):
+                by_position[pos] = _to_chunk(doc, meta)
+
+    all_chunks = list(by_position.values())
+    rerank_started = time.perf_counter()
+
     def relevance_score(chunk):
         score = 0
-        linked_title_lower = normalize_text(str(chunk.get('linked_title', '')))
-        chunk_text_lower = normalize_text(str(chunk.get('chunk', '')))
-        chunk_type_lower = str(chunk.get('type', '')).lower()
-        position = chunk.get('position', -1)
-        if any(term in linked_title_lower for term in all_query_terms):
+        title_match = mentions_query(chunk['_title_tokens'])
+        if title_match:
             score += 4
-        if any(term in chunk_text_lower for term in all_query_terms):
+        if mentions_query(chunk['_text_tokens']):
             score += 2
-        if chunk_type_lower == 'text' and any(term in linked_title_lower for term in all_query_terms):
+        if str(chunk['type']).lower() == 'text' and title_match:
             score += 4
+        position = chunk['position'] % SOURCE_POSITION_STRIDE
         if position > 0:
             score -= (position - 1) * 0.1
         return score
 
-    sorted_chunks = sorted(all_chunks, key=relevance_score, reverse=True)
+    relevance = {chunk['position']: relevance_score(chunk) for chunk in all_chunks}
+    relevance_rank = {pos: rank for rank, pos in enumerate(sorted(relevance, key=relevance.get, reverse=True))}
+
+    def fused_score(pos):
+        # Neighbours share the vector/BM25 ranks of the hit that pulled them in.
+        source = anchor.get(pos, pos)
+        score = 1 / (config.RRF_K + relevance_rank[pos])
+        for ranks in (vector_rank, lexical_rank):
+            if source in ranks:
+                score += 1 / (config.RRF_K + ranks[source])
+        return score
+
+    scores = {pos: fused_score(pos) for pos in by_position}
+    sorted_chunks = sorted(all_chunks, key=lambda c: scores[c['position']], reverse=True)
     
-    # Apply merging: if a chunk is of type 'title', merge it with the next chunk if that next chunk is 'text'
+    # Apply merging: a 'title' chunk absorbs the following 'text' chunks of its section
     merged_results = []
     seen_positions = set()
     for chunk in sorted_chunks:
         pos = chunk['position']
         if pos in seen_positions:
             continue
-        if chunk['type'].lower() == 'title':
-            next_chunk_candidate = next((c for c in all_chunks if c['position'] == pos + 1 and c['type'].lower() == 'text'), None)
-            if next_chunk_candidate and next_chunk_candidate['linked_title'] == chunk['chunk']:
-                merged_chunk = {
-                    'chunk': f"{chunk['chunk']} {next_chunk_candidate['chunk']}",
-                    'source': chunk['source'],
-                    'type': 'Merged Title+Text',
-                    'linked_title': chunk['linked_title'],
-                    'position': pos
-                }
-                merged_results.append(merged_chunk)
-                seen_positions.add(pos)
-                seen_positions.add(pos + 1)
-                continue
-        merged_results.append(chunk)
         seen_positions.add(pos)
+        result = {key: chunk[key] for key in ('chunk', 'source', 'type', 'linked_title', 'position',
+                                               'start_time', 'end_time')}
+        if str(chunk['type']).lower() == 'title':
+            body = []
+            for next_pos in range(pos + 1, pos + neighbor_window + 1):
+                candidate = by_position.get(next_pos)
+                if (candidate is None or next_pos in seen_positions
+                        or str(candidate['type']).lower() != 'text'
+                        or candidate['linked_title'] != chunk['chunk']):
+                    break
+                body.append(candidate['chunk'])
+                seen_positions.add(next_pos)
+            if body:
+                result['chunk'] = ' '.join([chunk['chunk']] + body)
+                result['type'] = 'Merged Title+Text'
+        merged_results.append(result)
 
     # Select top n_results from merged_results
     top_chunks = merged_results[:n_results]
+    telemetry.observe_stage("ask", "rerank", time.perf_counter() - rerank_started)
     
-    app_logger.info("[VECTOR STORE]: Top Chunks:")
-    for idx, chunk in enumerate(top_chunks):
-        score = relevance_score(chunk) if chunk.get('type') != 'Merged Title+Text' else "Merged"
-        app_logger.info("[VECTOR STORE]: Rank %d: Chunk: %s..., Type: %s, Position: %d, Score: %s", 
-                        idx+1, chunk['chunk'][:50], chunk['type'], chunk['position'], score)
+    if log_payloads:
+        app_logger.info("[VECTOR STORE]: Top Chunks:")
+        for idx, chunk in enumerate(top_chunks):
+            app_logger.info("[VECTOR STORE]: Rank %d: Chunk: %s..., Type: %s, Position: %d, Score: %.4f", 
+                            idx+1, chunk['chunk'][:50], chunk['type'], chunk['position'], scores[chunk['position']])
     
     return top_chunks
 
@@ -198,13 +489,3 @@ def sanitize_metadata(metadata: dict) -> dict:
             except Exception:
                 sanitized[key] = "UNSERIALIZABLE"
     return sanitized
-
-def get_vectorstore():
-    from langchain_huggingface import HuggingFaceEmbeddings
-    embeddings = HuggingFaceEmbeddings(model_name=config.EMBEDDING_MODEL)
-    from langchain_chroma import Chroma
-    return Chroma(
-        collection_name="document_chunks",
-        embedding_function=embeddings,
-        persist_directory=config.VECTOR_STORE_PATH
-    )